@@ -1,22 +1,114 @@
-import pygame
-import random
 import time
-import sys
+IMPORT_START = time.perf_counter()
+
+import pygame
 import csv
+import math
+import os
+from contextlib import contextmanager
 
 # -----------------------------
 # INITIALIZE
 # -----------------------------
-pygame.init()
-
+# Importing this module has no side effects: main() opens the window, loads the
+# fonts and creates the session. Only the display and font subsystems are started.
 WIDTH, HEIGHT = 900, 500
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Task Switching Experiment")
+screen = None
+clock = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Fonts are looked up with pygame.font.match_font() once and the resulting files
+# cached in FONT_CACHE_FILE, so later launches skip the system font scan behind
+# SysFont(). Set FONT_PATH (and FONT_BOLD_PATH) to bundled .ttf files to skip the
+# lookup entirely.
+FONT_NAME = "arial"
+FONT_PATH = None
+FONT_BOLD_PATH = None
+FONT_CACHE_FILE = os.path.join(BASE_DIR, ".font_cache.json")
+
+FONT = None
+SMALL_FONT = None
+FONT_BOLD = None
+SWITCH_FONT = None
+
+STARTUP_REPORT = True
+EXIT_REPORT = True  # logger, text cache, input latency and frame timing summaries
+startup_times = []  # (step, seconds)
+font_cache_misses = 0
+
+@contextmanager
+def startup_step(name):
+    start = time.perf_counter()
+    yield
+    startup_times.append((name, time.perf_counter() - start))
+
+def load_font_cache():
+    try:
+        with open(FONT_CACHE_FILE) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+def resolve_font(name, bold, cache):
+    # Same lookup as SysFont(): (font file or None for the default font, fake bold)
+    global font_cache_misses
+
+    key = f"{name}:{'bold' if bold else 'regular'}"
+    entry = cache.get(key)
+    if entry is not None and (entry[0] is None or os.path.exists(entry[0])):
+        return entry
+
+    font_cache_misses += 1
+    path = pygame.font.match_font(name, bold=bold)
+    # match_font() falls back to the regular face, which SysFont() then emboldens
+    fake_bold = bold and (path is None or path == pygame.font.match_font(name))
+    cache[key] = [path, fake_bold]
+    return cache[key]
+
+def make_font(size, bold, cache):
+    if FONT_PATH is not None:
+        path = FONT_BOLD_PATH if bold and FONT_BOLD_PATH is not None else FONT_PATH
+        fake_bold = bold and path == FONT_PATH
+    else:
+        path, fake_bold = resolve_font(FONT_NAME, bold, cache)
+
+    font = pygame.font.Font(path, size)
+    if fake_bold:
+        font.set_bold(True)
+    return font
 
-FONT = pygame.font.SysFont("arial", 32)
-SMALL_FONT = pygame.font.SysFont("arial", 24)
-FONT_BOLD = pygame.font.SysFont("arial", 32, bold=True)
-SWITCH_FONT = pygame.font.SysFont("arial", 64, bold=True)  # <- bigger banner
+def load_fonts():
+    global FONT, SMALL_FONT, FONT_BOLD, SWITCH_FONT
+
+    cache = load_font_cache()
+    misses = font_cache_misses
+
+    FONT = make_font(32, False, cache)
+    SMALL_FONT = make_font(24, False, cache)
+    FONT_BOLD = make_font(32, True, cache)
+    SWITCH_FONT = make_font(64, True, cache)  # <- bigger banner
+
+    if font_cache_misses != misses:
+        try:
+            with open(FONT_CACHE_FILE, "w") as file:
+                json.dump(cache, file)
+        except OSError:
+            pass  # the cache only saves time
+
+def init_display():
+    global screen, clock
+
+    with startup_step("display"):
+        pygame.display.init()
+        screen = pygame.display.set_mode((WIDTH, HEIGHT))
+        pygame.display.set_caption("Task Switching Experiment")
+
+    with startup_step("fonts"):
+        pygame.font.init()
+        load_fonts()
+
+    clock = pygame.time.Clock()
 
 BG = (245, 245, 250)
 WHITE = (255, 255, 255)
@@ -27,273 +119,299 @@ GREEN = (75, 180, 110)
 ACCENT = (70, 130, 210)
 SUBTLE = (140, 145, 160)
 
-clock = pygame.time.Clock()
+# -----------------------------
+# TEXT RENDERING (LRU SURFACE CACHE)
+# -----------------------------
+from collections import OrderedDict
+
+TEXT_CACHE_SIZE = 256
+text_cache = OrderedDict()
+text_cache_stats = {"hits": 0, "misses": 0}
+
+def render_text(font, text, antialias, color):
+    # Same arguments as Font.render(); surfaces are shared, so only blit them
+    key = (font, text, antialias, color)
+    surface = text_cache.get(key)
+
+    if surface is not None:
+        text_cache.move_to_end(key)
+        text_cache_stats["hits"] += 1
+        return surface
+
+    text_cache_stats["misses"] += 1
+    surface = font.render(text, antialias, color).convert_alpha()
+    text_cache[key] = surface
+    if len(text_cache) > TEXT_CACHE_SIZE:
+        text_cache.popitem(last=False)
+    return surface
 
-import os
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 SESSION_DIR = os.path.join(BASE_DIR, "session_data")
-os.makedirs(SESSION_DIR, exist_ok=True)
 
 import datetime
+import json
+from trial_logger import TrialLogger
 CSV_FILE = None
+trial_logger = None
+
+# Trial rows are written by a background thread (see trial_logger.py).
+# LOG_FLUSH_EVERY: flush after this many rows (0 = off)
+# LOG_FLUSH_INTERVAL: flush at least this often in seconds (None = off)
+# LOG_FSYNC: fsync on every flush (the file is always fsynced on close)
+LOG_FLUSH_EVERY = 1
+LOG_FLUSH_INTERVAL = None
+LOG_FSYNC = False
 
 def create_csv():
-    global CSV_FILE
+    global CSV_FILE, trial_logger
     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
     filename = f"results_{timestamp}.csv"
     CSV_FILE = os.path.join(SESSION_DIR, filename)
 
     with open(CSV_FILE, "w", newline="") as file:
         writer = csv.writer(file)
-        writer.writerow([
-            "trial",
-            "complexity",
-            "interval_length",
-            "task_type",
-            "actual_count",
-            "user_answer",
-            "correct"
-        ])
+        writer.writerow(TRIAL_COLUMNS)
 
-# -----------------------------
-# SUMMARY TRACKING OF DATA
-# -----------------------------
-summary_data = {}
+    write_session_info()
 
-for c in [1, 2, 3]:
-    for t in [1, 2]:
-        summary_data[(c, t)] = {
-            "total": 0,
-            "correct": 0
-        }
+    trial_logger = TrialLogger(
+        CSV_FILE,
+        flush_every=LOG_FLUSH_EVERY,
+        flush_interval=LOG_FLUSH_INTERVAL,
+        fsync=LOG_FSYNC,
+    )
 
-def write_summary_to_csv():
-    if CSV_FILE is None:
-        return
+def write_session_info():
+    # The seed reproduces this session's block order and each block's stimulus sequences
+    os.makedirs(SUMMARY_DIR, exist_ok=True)
+    name = os.path.splitext(os.path.basename(CSV_FILE))[0] + "_info.json"
+    with open(os.path.join(SUMMARY_DIR, name), "w") as file:
+        json.dump({"seed": engine.seed, "conditions": engine.conditions}, file)
 
-    # First, read how many trials were written
-    with open(CSV_FILE, "r") as file:
-        row_count = sum(1 for _ in file)
+def close_trial_logger():
+    # Drain queued rows and close the file before anything else touches it
+    if trial_logger is not None:
+        trial_logger.close()
 
-    # Now reopen in read+write mode
+# -----------------------------
+# SUMMARY OF DATA
+# -----------------------------
+SUMMARY_HEADER = [
+    "Complexity",
+    "Task Type",
+    "Total Completed",
+    "Correctly Completed",
+    "Accuracy (%)"
+]
+
+# The summary is written to its own small file in session_data/summaries/ so the
+# trial CSV stays append-only. Set LEGACY_IN_PLACE_SUMMARY = True to also pad the
+# trial CSV and write the summary beside the trials (old layout).
+SUMMARY_DIR = os.path.join(SESSION_DIR, "summaries")
+LEGACY_IN_PLACE_SUMMARY = False
+legacy_summary_written = False
+
+def summary_rows(summary_data):
+    rows = []
+    for (c, t), values in summary_data.items():
+        total = values["total"]
+        correct = values["correct"]
+        accuracy = round((correct / total) * 100, 2) if total > 0 else 0
+        rows.append([c, t, total, correct, accuracy])
+    return rows
+
+def write_summary_sidecar(summary_data):
+    os.makedirs(SUMMARY_DIR, exist_ok=True)
+    name = os.path.splitext(os.path.basename(CSV_FILE))[0] + "_summary.csv"
+    path = os.path.join(SUMMARY_DIR, name)
+
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(SUMMARY_HEADER)
+        writer.writerows(summary_rows(summary_data))
+    os.replace(temp_path, path)
+
+def write_legacy_summary(summary_data):
     with open(CSV_FILE, "r+", newline="") as file:
         reader = list(csv.reader(file))
-        file.seek(0)
-        writer = csv.writer(file)
+
+        # Summary goes two columns right of the trial columns (column J for the
+        # original 7-column layout)
+        summary_start_col = len(reader[0]) + 2 if reader else 9
 
         # Make sure every row has enough columns (pad with blanks)
-        max_columns = 15  # ensures room for summary on right
+        max_columns = summary_start_col + len(SUMMARY_HEADER) + 1  # ensures room for summary on right
         padded_rows = []
         for row in reader:
             padded = row + [""] * (max_columns - len(row))
             padded_rows.append(padded)
 
-        # Rewrite padded data
-        writer.writerows(padded_rows)
-
-        # Now write summary starting in column index 9 (column J visually)
-        summary_start_col = 9
+        # Short sessions still need room for the summary block
+        while len(padded_rows) < 2 + len(summary_data):
+            padded_rows.append([""] * max_columns)
 
         # Write header row summary titles
         padded_rows[0][summary_start_col] = "===== SUMMARY ====="
-        padded_rows[1][summary_start_col] = "Complexity"
-        padded_rows[1][summary_start_col + 1] = "Task Type"
-        padded_rows[1][summary_start_col + 2] = "Total Completed"
-        padded_rows[1][summary_start_col + 3] = "Correctly Completed"
-        padded_rows[1][summary_start_col + 4] = "Accuracy (%)"
+        for i, title in enumerate(SUMMARY_HEADER):
+            padded_rows[1][summary_start_col + i] = title
 
         # Fill summary rows
-        row_index = 2
-        for (c, t), values in summary_data.items():
-            total = values["total"]
-            correct = values["correct"]
-            accuracy = round((correct / total) * 100, 2) if total > 0 else 0
-
-            padded_rows[row_index][summary_start_col] = c
-            padded_rows[row_index][summary_start_col + 1] = t
-            padded_rows[row_index][summary_start_col + 2] = total
-            padded_rows[row_index][summary_start_col + 3] = correct
-            padded_rows[row_index][summary_start_col + 4] = accuracy
-
-            row_index += 1
+        for row_index, values in enumerate(summary_rows(summary_data), start=2):
+            for i, value in enumerate(values):
+                padded_rows[row_index][summary_start_col + i] = value
 
         # Rewrite everything with summary
         file.seek(0)
+        writer = csv.writer(file)
         writer.writerows(padded_rows)
+        file.truncate()
 
-# -----------------------------
-# EXPERIMENT DESIGN (3x3)
-# -----------------------------
-complexities = [1, 2, 3]
-intervals = [10, 20, 30]
-
-# Randomize the ORDER of complexity blocks
-complexity_order = complexities.copy()
-random.shuffle(complexity_order)
+def write_summary_to_csv(summary_data):
+    global legacy_summary_written
 
-conditions = []
-
-# Randomize complexity for each level (i.e., 2 can be first) but complexity is constant for consecutive trials 1-3, 3-6, 7,-9
-for c in complexity_order:
-    shuffled_intervals = intervals.copy()
-    random.shuffle(shuffled_intervals)
+    if CSV_FILE is None:
+        return
 
-    for i in shuffled_intervals:
-        conditions.append((c, i))
+    close_trial_logger()
 
-current_condition_index = 0
+    # summary_data is kept up to date by the engine, so this never rereads the trials
+    write_summary_sidecar(summary_data)
 
-# -----------------------------
-# TASK VARIABLES
-# -----------------------------
-digit_string = ""
-target_digits = []
-task_type = 1  # 1 = count targets, 2 = count non-targets
-user_input = ""
-tasks_completed = 0
-TOTAL_TRIAL_TIME = 120  # seconds
+    if LEGACY_IN_PLACE_SUMMARY and not legacy_summary_written:
+        write_legacy_summary(summary_data)
+        legacy_summary_written = True
 
 # -----------------------------
-# GAME/GLOBAL VARIABLES
+# SESSION ENGINE
 # -----------------------------
-
-STATE_START = 0
-STATE_COUNTDOWN = 1
-STATE_RUNNING = 2
-STATE_BREAK = 3
-STATE_DONE = 4
-STATE_TUTORIAL = 5
-STATE_TUTORIAL_DONE = 6
-
-BREAK_DURATION = 10
-break_start_time = None
-
-game_state = STATE_START
-countdown_start_time = None
-
-# Keep track of intervals
-condition_start_time = time.time() 
-interval_start_time = time.time()
-last_switch_time = time.time()
+# The experiment's state machine (block order, trials, timing, tutorial) lives in
+# session_engine.py. This file draws it with pygame and feeds it mouse/keyboard input.
+from session_engine import (
+    SessionEngine,
+    STATE_START,
+    STATE_COUNTDOWN,
+    STATE_RUNNING,
+    STATE_BREAK,
+    STATE_DONE,
+    STATE_TUTORIAL,
+    STATE_TUTORIAL_DONE,
+    TOTAL_TRIAL_TIME,
+    BREAK_DURATION,
+    COUNTDOWN_DURATION,
+    INPUT_START,
+    INPUT_TUTORIAL,
+    INPUT_QUIT,
+    INPUT_ENTER,
+    INPUT_BACKSPACE,
+    INPUT_SPACE,
+    TRIAL_COLUMNS,
+)
+
+def log_trial(row):
+    trial_logger.log(row)
+
+# Optional precomputed stimulus bank (build it with: python stimulus_bank.py).
+# STIMULUS_SAMPLING = None generates stimuli on the fly; "uniform" draws from the
+# bank with the natural answer distribution, "balanced" gives every answer equal odds.
+STIMULUS_BANK_FILE = os.path.join(BASE_DIR, "stimulus_bank.bin")
+STIMULUS_SAMPLING = None
+
+stimulus_bank = None
+engine = None
+
+def init_session():
+    # Creates the engine, which draws this session's seed and block order
+    global stimulus_bank, engine, last_cursor_toggle
+
+    os.makedirs(SESSION_DIR, exist_ok=True)
+
+    if STIMULUS_SAMPLING is not None:
+        from stimulus_bank import StimulusBank
+        stimulus_bank = StimulusBank.load(STIMULUS_BANK_FILE)
+
+    engine = SessionEngine(
+        on_start=create_csv,
+        on_trial=log_trial,
+        on_finish=write_summary_to_csv,
+        stimulus_bank=stimulus_bank,
+        stimulus_sampling=STIMULUS_SAMPLING,
+    )
+    last_cursor_toggle = engine.clock()
 
 # Cursor
 CURSOR_BLINK_INTERVAL = 0.5  # seconds
 cursor_visible = True
-last_cursor_toggle = time.time()
-
-# Task-switch banner
-switch_banner_time = 0
-SWITCH_BANNER_DURATION = 1.0
+last_cursor_toggle = 0.0
 
-# Tutorial state
-tutorial_step = 0  # 0=explain task1, 1=practice task1, 2=explain task2, 3=practice task2
-tutorial_input = ""
-tutorial_feedback = ""  # "correct" or "incorrect" or ""
 
 # -----------------------------
-# GENERATION FUNCTIONS
+# DRAW UI
 # -----------------------------
-def generate_trial(complexity, length=10):
-    global digit_string, target_digits
-
-    while True:
-        digit_string = "".join(str(random.randint(0, 9)) for _ in range(length))
-        target_digits = random.sample(range(10), complexity)
-
-        # Ensure the answer is never 10:
-        # For task 2 (non-target count), ensure at least 1 target digit appears so the 
-        # answer is at most 9. Task 1 has no restriction (0 is valid, 10 is impossibly rare).
-        target_count = sum(digit_string.count(str(d)) for d in target_digits)
-        if task_type == 1 or target_count > 0:
-            break
-
-
-def compute_answer():
-    if task_type == 1:
-        return sum(digit_string.count(str(d)) for d in target_digits)
-    else:
-        total_targets = sum(digit_string.count(str(d)) for d in target_digits)
-        return len(digit_string) - total_targets
-    
-def log_trial(correct_flag, actual_count, user_answer):
-    global tasks_completed
-
-    tasks_completed += 1
-
-    # Track summary counts
-    summary_data[(complexity, task_type)]["total"] += 1
-    if correct_flag == 1:
-        summary_data[(complexity, task_type)]["correct"] += 1
-
-    with open(CSV_FILE, "a", newline="") as file:
-        writer = csv.writer(file)
-        writer.writerow([
-            tasks_completed,
-            complexity,
-            duration,
-            task_type,
-            actual_count,
-            user_answer,
-            correct_flag
-        ])
-
-def switch_task():
-    global task_type
-    task_type = 2 if task_type == 1 else 1
+PROGRESS_BAR_RECT = pygame.Rect(50, HEIGHT - 60, WIDTH - 100, 16)
 
+def draw_progress_track(surface):
+    # background
+    pygame.draw.rect(surface, GRAY, PROGRESS_BAR_RECT, border_radius=8)
 
-# -----------------------------
-# DRAW UI
-# -----------------------------
-def draw_progress_bar():
-    bar_x = 50
-    bar_y = HEIGHT - 60
-    bar_width = WIDTH - 100
-    bar_height = 16
+def draw_progress_fill(surface):
+    bar_x, bar_y, bar_width, bar_height = PROGRESS_BAR_RECT
 
-    elapsed = time.time() - condition_start_time
+    elapsed = engine.clock() - engine.condition_start_time
     progress = min(elapsed / TOTAL_TRIAL_TIME, 1)
 
-    # background
-    pygame.draw.rect(screen, GRAY, (bar_x, bar_y, bar_width, bar_height), border_radius=8)
-
     # filled portion
     if int(bar_width * progress) > 0:
         pygame.draw.rect(
-            screen,
+            surface,
             ACCENT,
             (bar_x, bar_y, int(bar_width * progress), bar_height),
             border_radius=8
         )
 
-    # -----------------------------
-    # DRAW INTERVAL MARKS
-    # -----------------------------
+def draw_interval_marks(surface, duration=None):
+    if duration is None:
+        duration = engine.duration
+    bar_x, bar_y, bar_width, bar_height = PROGRESS_BAR_RECT
     num_marks = TOTAL_TRIAL_TIME // duration
 
     for i in range(1, int(num_marks)):
         mark_x = bar_x + (i / num_marks) * bar_width
 
         pygame.draw.line(
-            screen,
+            surface,
             BLACK,
             (mark_x, bar_y - 5),
             (mark_x, bar_y + bar_height + 5),
             2,
         )
 
+def draw_progress_bar(surface=None):
+    if surface is None:
+        surface = screen
+    draw_progress_track(surface)
+    draw_progress_fill(surface)
+
+    # -----------------------------
+    # DRAW INTERVAL MARKS
+    # -----------------------------
+    draw_interval_marks(surface)
+
+    # Area covered by the bar including the interval marks
+    return PROGRESS_BAR_RECT.inflate(0, 12)
+
 def draw_break_screen():
     screen.fill(BG)
 
-    title_surface = FONT.render("Break Time", True, BLACK)
+    title_surface = render_text(FONT, "Break Time", True, BLACK)
     title_rect = title_surface.get_rect(center=(WIDTH//2, 180))
     screen.blit(title_surface, title_rect)
 
-    remaining = BREAK_DURATION - int(time.time() - break_start_time)
+    remaining = BREAK_DURATION - int(engine.clock() - engine.break_start_time)
     if remaining < 0:
         remaining = 0
 
-    countdown_surface = FONT.render(
+    countdown_surface = render_text(
+        FONT,
         f"Next block starts in {remaining} seconds",
         True,
         SUBTLE
@@ -302,8 +420,9 @@ def draw_break_screen():
     screen.blit(countdown_surface, countdown_rect)
 
     # Block progress
-    block_label = SMALL_FONT.render(
-        f"Completed {current_condition_index} of {len(conditions)} blocks",
+    block_label = render_text(
+        SMALL_FONT,
+        f"Completed {engine.current_condition_index} of {len(engine.conditions)} blocks",
         True, SUBTLE
     )
     block_rect = block_label.get_rect(center=(WIDTH//2, 300))
@@ -314,11 +433,11 @@ def draw_break_screen():
 def draw_done_screen():
     screen.fill(BG)
 
-    title_surface = FONT.render("Experiment Complete", True, BLACK)
+    title_surface = render_text(FONT, "Experiment Complete", True, BLACK)
     title_rect = title_surface.get_rect(center=(WIDTH//2, HEIGHT//2 - 30))
     screen.blit(title_surface, title_rect)
 
-    sub_surface = SMALL_FONT.render("Thank you for participating! You may close this window.", True, SUBTLE)
+    sub_surface = render_text(SMALL_FONT, "Thank you for participating! You may close this window.", True, SUBTLE)
     sub_rect = sub_surface.get_rect(center=(WIDTH//2, HEIGHT//2 + 20))
     screen.blit(sub_surface, sub_rect)
 
@@ -327,13 +446,14 @@ def draw_done_screen():
 def draw_tutorial_done_screen():
     screen.fill(BG)
 
-    title = SWITCH_FONT.render("Tutorial Completed", True, ACCENT)
+    title = render_text(SWITCH_FONT, "Tutorial Completed", True, ACCENT)
     screen.blit(title, title.get_rect(center=(WIDTH//2, 180)))
 
-    ready_text = FONT.render("You are now ready.", True, BLACK)
+    ready_text = render_text(FONT, "You are now ready.", True, BLACK)
     screen.blit(ready_text, ready_text.get_rect(center=(WIDTH//2, 260)))
 
-    instruction = SMALL_FONT.render(
+    instruction = render_text(
+        SMALL_FONT,
         "Press Space Bar to return home",
         True,
         SUBTLE
@@ -346,7 +466,7 @@ def draw_start_screen():
     screen.fill(BG)
 
     # Title
-    title_surface = FONT.render("Task-Switching Experiment (9 Blocks)", True, BLACK)
+    title_surface = render_text(FONT, "Task-Switching Experiment (9 Blocks)", True, BLACK)
     title_rect = title_surface.get_rect(center=(WIDTH//2, 80))
     screen.blit(title_surface, title_rect)
 
@@ -361,7 +481,7 @@ def draw_start_screen():
     ]
 
     for i, line in enumerate(lines):
-        line_surface = SMALL_FONT.render(line, True, BLACK)
+        line_surface = render_text(SMALL_FONT, line, True, BLACK)
         line_rect = line_surface.get_rect(center=(WIDTH//2, 150 + i*40))
         screen.blit(line_surface, line_rect)
 
@@ -369,7 +489,7 @@ def draw_start_screen():
     tutorial_rect = pygame.Rect(WIDTH//2 - 220, 400, 200, 55)
     pygame.draw.rect(screen, ACCENT, tutorial_rect, border_radius=10)
 
-    tutorial_text = FONT.render("TUTORIAL", True, WHITE)
+    tutorial_text = render_text(FONT, "TUTORIAL", True, WHITE)
     tutorial_text_rect = tutorial_text.get_rect(center=tutorial_rect.center)
     screen.blit(tutorial_text, tutorial_text_rect)
 
@@ -377,7 +497,7 @@ def draw_start_screen():
     start_rect = pygame.Rect(WIDTH//2 + 20, 400, 200, 55)
     pygame.draw.rect(screen, GREEN, start_rect, border_radius=10)
 
-    start_text = FONT.render("START", True, WHITE)
+    start_text = render_text(FONT, "START", True, WHITE)
     start_text_rect = start_text.get_rect(center=start_rect.center)
     screen.blit(start_text, start_text_rect)
 
@@ -389,8 +509,8 @@ def draw_tutorial():
     screen.fill(BG)
 
     # Explanation steps (0 and 2)
-    if tutorial_step == 0:
-        title = FONT.render("Tutorial — Task 1", True, BLACK)
+    if engine.tutorial_step == 0:
+        title = render_text(FONT, "Tutorial — Task 1", True, BLACK)
         screen.blit(title, title.get_rect(center=(WIDTH//2, 60)))
 
         lines = [
@@ -403,11 +523,11 @@ def draw_tutorial():
             "Press SPACE to try a practice round."
         ]
         for i, line in enumerate(lines):
-            s = SMALL_FONT.render(line, True, BLACK)
+            s = render_text(SMALL_FONT, line, True, BLACK)
             screen.blit(s, s.get_rect(center=(WIDTH//2, 140 + i * 35)))
 
-    elif tutorial_step == 2:
-        title = FONT.render("Tutorial — Task 2", True, BLACK)
+    elif engine.tutorial_step == 2:
+        title = render_text(FONT, "Tutorial — Task 2", True, BLACK)
         screen.blit(title, title.get_rect(center=(WIDTH//2, 60)))
 
         lines = [
@@ -420,19 +540,19 @@ def draw_tutorial():
             "Press SPACE to try a practice round."
         ]
         for i, line in enumerate(lines):
-            s = SMALL_FONT.render(line, True, BLACK)
+            s = render_text(SMALL_FONT, line, True, BLACK)
             screen.blit(s, s.get_rect(center=(WIDTH//2, 140 + i * 35)))
 
     # Practice steps (1 and 3)
-    elif tutorial_step in (1, 3):
-        practice_task = 1 if tutorial_step == 1 else 2
+    elif engine.tutorial_step in (1, 3):
+        practice_task = 1 if engine.tutorial_step == 1 else 2
 
         if practice_task == 1:
-            label = FONT.render("Practice — Count target digits:", True, BLACK)
+            label = render_text(FONT, "Practice — Count target digits:", True, BLACK)
         else:
-            part1 = FONT.render("Practice — Count digits ", True, BLACK)
-            part2 = FONT_BOLD.render("NOT", True, RED)
-            part3 = FONT.render(" in targets:", True, BLACK)
+            part1 = render_text(FONT, "Practice — Count digits ", True, BLACK)
+            part2 = render_text(FONT_BOLD, "NOT", True, RED)
+            part3 = render_text(FONT, " in targets:", True, BLACK)
 
         if practice_task == 1:
             screen.blit(label, label.get_rect(center=(WIDTH//2, 60)))
@@ -444,11 +564,11 @@ def draw_tutorial():
             screen.blit(part3, (sx + part1.get_width() + part2.get_width(), 48))
 
         # Targets
-        targets_surface = FONT.render(f"Targets: {set(target_digits)}", True, BLACK)
+        targets_surface = render_text(FONT, f"Targets: {set(engine.target_digits)}", True, BLACK)
         screen.blit(targets_surface, targets_surface.get_rect(center=(WIDTH//2, 120)))
 
         # Digit string
-        digits_surface = FONT.render(digit_string, True, BLACK)
+        digits_surface = render_text(FONT, engine.digit_string, True, BLACK)
         screen.blit(digits_surface, digits_surface.get_rect(center=(WIDTH//2, 180)))
 
         # Input box
@@ -456,13 +576,13 @@ def draw_tutorial():
         pygame.draw.rect(screen, WHITE, input_box_rect, border_radius=8)
         pygame.draw.rect(screen, GRAY, input_box_rect, 2, border_radius=8)
 
-        input_surface = FONT.render(tutorial_input, True, BLACK)
+        input_surface = render_text(FONT, engine.tutorial_input, True, BLACK)
         input_rect = input_surface.get_rect(center=input_box_rect.center)
         screen.blit(input_surface, input_rect)
 
         # Cursor
         if cursor_visible:
-            if tutorial_input == "":
+            if engine.tutorial_input == "":
                 cx = input_box_rect.centerx
             else:
                 cx = input_rect.right + 2
@@ -470,15 +590,15 @@ def draw_tutorial():
                              (cx, input_box_rect.centery + 15), 2)
 
         # Feedback
-        if tutorial_feedback == "correct":
-            fb = FONT.render("Correct! Press SPACE to continue.", True, GREEN)
+        if engine.tutorial_feedback == "correct":
+            fb = render_text(FONT, "Correct! Press SPACE to continue.", True, GREEN)
             screen.blit(fb, fb.get_rect(center=(WIDTH//2, 330)))
-        elif tutorial_feedback == "incorrect":
-            fb = FONT.render("Incorrect. Try again.", True, RED)
+        elif engine.tutorial_feedback == "incorrect":
+            fb = render_text(FONT, "Incorrect. Try again.", True, RED)
             screen.blit(fb, fb.get_rect(center=(WIDTH//2, 330)))
 
         # Hint
-        hint = SMALL_FONT.render("Type your answer and press ENTER.", True, SUBTLE)
+        hint = render_text(SMALL_FONT, "Type your answer and press ENTER.", True, SUBTLE)
         screen.blit(hint, hint.get_rect(center=(WIDTH//2, 400)))
 
     pygame.display.flip()
@@ -486,94 +606,104 @@ def draw_tutorial():
 def draw_countdown():
     screen.fill(BG)
 
-    elapsed = time.time() - countdown_start_time
-    remaining = 5 - int(elapsed)
+    elapsed = engine.clock() - engine.countdown_start_time
+    remaining = COUNTDOWN_DURATION - int(elapsed)
 
     if remaining < 0:
         remaining = 0
 
-    countdown_surface = FONT.render(f"Starting in {remaining}", True, BLACK)
+    countdown_surface = render_text(FONT, f"Starting in {remaining}", True, BLACK)
     countdown_rect = countdown_surface.get_rect(center=(WIDTH//2, HEIGHT//2))
     screen.blit(countdown_surface, countdown_rect)
 
     pygame.display.flip()
 
-def draw_interface(duration):
-    screen.fill(BG)
-    Y_OFFSET = 30 # Change Y Position
+Y_OFFSET = 30 # Change Y Position
+INPUT_BOX_RECT = pygame.Rect(WIDTH//2 - 60, 210 + Y_OFFSET, 120, 50)
+
+def draw_interface_background(surface, task_type=None):
+    if task_type is None:
+        task_type = engine.task_type
+    surface.fill(BG)
 
     # -----------------------------
     # BLOCK PROGRESS (top-right)
     # -----------------------------
-    block_label = SMALL_FONT.render(
-        f"Block {current_condition_index + 1} / {len(conditions)}",
+    block_label = render_text(
+        SMALL_FONT,
+        f"Block {engine.current_condition_index + 1} / {len(engine.conditions)}",
         True, SUBTLE
     )
-    screen.blit(block_label, (WIDTH - block_label.get_width() - 20, 12))
+    surface.blit(block_label, (WIDTH - block_label.get_width() - 20, 12))
 
     # -----------------------------
     # INSTRUCTION TEXT
     # -----------------------------
     if task_type == 1:
-        instruction_surface = FONT.render(
+        instruction_surface = render_text(
+            FONT,
             "Count digits in the target set:",
             True,
             BLACK
         )
         instruction_rect = instruction_surface.get_rect(center=(WIDTH//2, 50 + Y_OFFSET))
-        screen.blit(instruction_surface, instruction_rect)
+        surface.blit(instruction_surface, instruction_rect)
 
     else:
         # Split into three parts
-        part1 = FONT.render("Count digits ", True, BLACK)
-        part2 = FONT_BOLD.render("NOT", True, RED)
-        part3 = FONT.render(" in the target set:", True, BLACK)
+        part1 = render_text(FONT, "Count digits ", True, BLACK)
+        part2 = render_text(FONT_BOLD, "NOT", True, RED)
+        part3 = render_text(FONT, " in the target set:", True, BLACK)
 
         total_width = part1.get_width() + part2.get_width() + part3.get_width()
 
         start_x = WIDTH//2 - total_width // 2
         y = 50
 
-        screen.blit(part1, (start_x, y))
-        screen.blit(part2, (start_x + part1.get_width(), y))
-        screen.blit(part3, (start_x + part1.get_width() + part2.get_width(), y))
+        surface.blit(part1, (start_x, y))
+        surface.blit(part2, (start_x + part1.get_width(), y))
+        surface.blit(part3, (start_x + part1.get_width() + part2.get_width(), y))
 
+def draw_targets(surface):
     # -----------------------------
     # TARGET DIGITS
     # -----------------------------
-    targets_surface = FONT.render(
-        f"Targets: {set(target_digits)}", True, BLACK
+    targets_surface = render_text(
+        FONT,
+        f"Targets: {set(engine.target_digits)}", True, BLACK
     )
     targets_rect = targets_surface.get_rect(center=(WIDTH//2, 110 + Y_OFFSET))
-    screen.blit(targets_surface, targets_rect)
+    return surface.blit(targets_surface, targets_rect)
 
+def draw_digit_string(surface):
     # -----------------------------
     # DIGIT STRING
     # -----------------------------
     # IF YOU WANT TO SEPARATE THE DIGITS WITH SPACES, USE THIS LINE:
-    # digits_surface = FONT.render(" ".join(digit_string), True, BLACK)
-    digits_surface = FONT.render(digit_string, True, BLACK)
+    # digits_surface = render_text(FONT, " ".join(engine.digit_string), True, BLACK)
+    digits_surface = render_text(FONT, engine.digit_string, True, BLACK)
     digits_rect = digits_surface.get_rect(center=(WIDTH//2, 170 + Y_OFFSET))
-    screen.blit(digits_surface, digits_rect)
+    return surface.blit(digits_surface, digits_rect)
 
+def draw_input_box(surface):
     # -----------------------------
     # INPUT BOX (rounded)
     # -----------------------------
-    input_box_rect = pygame.Rect(WIDTH//2 - 60, 210 + Y_OFFSET, 120, 50)
-    pygame.draw.rect(screen, WHITE, input_box_rect, border_radius=8)
-    pygame.draw.rect(screen, GRAY, input_box_rect, 2, border_radius=8)
+    input_box_rect = INPUT_BOX_RECT
+    pygame.draw.rect(surface, WHITE, input_box_rect, border_radius=8)
+    pygame.draw.rect(surface, GRAY, input_box_rect, 2, border_radius=8)
 
     # Render text centered
-    input_surface = FONT.render(user_input, True, BLACK)
+    input_surface = render_text(FONT, engine.user_input, True, BLACK)
     input_rect = input_surface.get_rect(center=input_box_rect.center)
-    screen.blit(input_surface, input_rect)
+    drawn = input_box_rect.union(surface.blit(input_surface, input_rect))
 
     # -----------------------------
     # BLINKING CURSOR (CENTERED)
     # -----------------------------
     if cursor_visible:
 
-        if user_input == "":
+        if engine.user_input == "":
             cursor_x = input_box_rect.centerx
         else:
             cursor_x = input_rect.right + 2
@@ -581,21 +711,41 @@ def draw_interface(duration):
         cursor_y_top = input_box_rect.centery - 15
         cursor_y_bottom = input_box_rect.centery + 15
 
-        pygame.draw.line(
-            screen,
+        drawn = drawn.union(pygame.draw.line(
+            surface,
             BLACK,
             (cursor_x, cursor_y_top),
             (cursor_x, cursor_y_bottom),
             2
-        )
+        ))
+
+    return drawn
+
+switch_banner = None
 
+def get_switch_banner():
+    # Kept out of the LRU text cache so a long block never evicts it
+    global switch_banner
+    if switch_banner is None:
+        switch_banner = SWITCH_FONT.render("TASK SWITCH!", True, ACCENT).convert_alpha()
+    return switch_banner
+
+def draw_switch_banner(surface):
     # -----------------------------
     # TASK-SWITCH BANNER
     # -----------------------------
-    if time.time() - switch_banner_time < SWITCH_BANNER_DURATION:
-        banner_surface = SWITCH_FONT.render("TASK SWITCH!", True, ACCENT)
+    if engine.switch_banner_visible():
+        banner_surface = get_switch_banner()
         banner_rect = banner_surface.get_rect(center=(WIDTH//2, 300 + Y_OFFSET))
-        screen.blit(banner_surface, banner_rect)
+        return surface.blit(banner_surface, banner_rect)
+    return pygame.Rect(WIDTH//2, 300 + Y_OFFSET, 0, 0)
+
+def draw_interface():
+    draw_interface_background(screen)
+    draw_targets(screen)
+    draw_digit_string(screen)
+    draw_input_box(screen)
+    draw_switch_banner(screen)
 
     # -----------------------------
     # PROGRESS BAR
@@ -604,235 +754,480 @@ def draw_interface(duration):
 
     pygame.display.flip()
 
+# -----------------------------
+# DIRTY-RECTANGLE RENDERING (STATE_RUNNING)
+# -----------------------------
+# With DIRTY_RECT_RENDERING on, the running screen is composited from a cached
+# static layer (background, block label, instruction text, progress-bar track and
+# interval marks) and only the areas whose content changed are redrawn and pushed
+# with pygame.display.update(rects). Other states always redraw in full, and so does
+# the running screen after the window is exposed or restored.
+DIRTY_RECT_RENDERING = True
+
+static_layers = {}
+dirty_layer_key = None
+dirty_element_state = {}
+
+def draw_static_layer(surface, task_type=None, duration=None):
+    draw_interface_background(surface, task_type)
+    draw_progress_track(surface)
+    draw_interval_marks(surface, duration)
+
+def draw_progress_overlay(surface):
+    draw_progress_fill(surface)
+    draw_interval_marks(surface)
+    return PROGRESS_BAR_RECT.inflate(0, 12)
+
+def progress_fill_width():
+    elapsed = engine.clock() - engine.condition_start_time
+    return int(PROGRESS_BAR_RECT.width * min(elapsed / TOTAL_TRIAL_TIME, 1))
+
+# Dynamic elements in drawing order: (name, draw function, content signature)
+DIRTY_ELEMENTS = [
+    ("targets", draw_targets, lambda: tuple(engine.target_digits)),
+    ("digits", draw_digit_string, lambda: engine.digit_string),
+    ("input", draw_input_box, lambda: (engine.user_input, cursor_visible)),
+    ("banner", draw_switch_banner, lambda: engine.switch_banner_visible()),
+    ("progress", draw_progress_overlay, progress_fill_width),
+]
+
+def get_static_layer(layer_key):
+    # layer_key is (block index, task type, interval length)
+    layer = static_layers.get(layer_key)
+    if layer is None:
+        # Layers from earlier blocks are never shown again
+        if not any(key[0] == layer_key[0] for key in static_layers):
+            static_layers.clear()
+        layer = pygame.Surface((WIDTH, HEIGHT)).convert()
+        draw_static_layer(layer, layer_key[1], layer_key[2])
+        static_layers[layer_key] = layer
+    return layer
+
+def invalidate_static_layers():
+    # Forces the next draw_interface_dirty() call to redraw the whole screen
+    global dirty_layer_key
+    dirty_layer_key = None
+    dirty_element_state.clear()
+
+# Events after which the window's contents may have been lost (uncovered, restored
+# from minimized or shown again); the cached screen state is then no longer on screen
+EXPOSE_EVENTS = (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED, pygame.WINDOWSHOWN)
+
+def handle_expose_events(events):
+    if any(event.type in EXPOSE_EVENTS for event in events):
+        invalidate_static_layers()
+
+def draw_interface_dirty():
+    global dirty_layer_key
+
+    layer_key = (engine.current_condition_index, engine.task_type, engine.duration)
+    layer = get_static_layer(layer_key)
+
+    if layer_key != dirty_layer_key:
+        screen.blit(layer, (0, 0))
+        for name, draw, signature in DIRTY_ELEMENTS:
+            dirty_element_state[name] = (signature(), draw(screen))
+        dirty_layer_key = layer_key
+        pygame.display.flip()
+        return
+
+    # Restore the old area of every element whose content changed
+    changed = []
+    for name, draw, signature in DIRTY_ELEMENTS:
+        value = signature()
+        if value != dirty_element_state[name][0]:
+            changed.append(name)
+
+    if not changed:
+        if frame_timer is not None:
+            frame_timer.no_update()
+        return
+
+    dirty_rects = []
+    for name in changed:
+        old_rect = dirty_element_state[name][1]
+        screen.blit(layer, old_rect, old_rect)
+        dirty_rects.append(old_rect)
+
+    # Redraw changed elements plus anything the restored areas overlapped
+    for name, draw, signature in DIRTY_ELEMENTS:
+        old_rect = dirty_element_state[name][1]
+        if name in changed or old_rect.collidelist(dirty_rects) != -1:
+            new_rect = draw(screen)
+            dirty_element_state[name] = (signature(), new_rect)
+            dirty_rects.append(new_rect)
+
+    pygame.display.update(dirty_rects)
+
 
 # -----------------------------
-# START FIRST TRIAL
+# BLOCK PREFETCH
 # -----------------------------
-complexity, duration = conditions[current_condition_index]
-generate_trial(complexity)
+# The countdown and every break are used to draw the next block's first stimuli
+# (see SessionEngine.prefetch_next_block) and to render their digit strings and target
+# sets, the block's static layer and the switch banner, so the block's first frames
+# only blit cached surfaces.
+BLOCK_PREFETCH = True
+prefetched_block = None
+
+def prefetch_next_block():
+    global prefetched_block
+
+    block = engine.current_condition_index
+    if prefetched_block == block:
+        return
+    prefetched_block = block
+
+    for digit_string, target_digits in engine.prefetch_next_block():
+        render_text(FONT, f"Targets: {set(target_digits)}", True, BLACK)
+        render_text(FONT, digit_string, True, BLACK)
+
+    render_text(FONT, "", True, BLACK)  # empty input box
+    get_switch_banner()
+    if DIRTY_RECT_RENDERING:
+        # Every block starts with the count task
+        get_static_layer((block, 1, engine.conditions[block][1]))
+
 
 # -----------------------------
-# MAIN LOOP
+# IDLE SCHEDULING
 # -----------------------------
+# With IDLE_EVENT_WAIT on, every state except STATE_RUNNING blocks in
+# pygame.event.wait() and only redraws when an event arrives, a deadline passes
+# (countdown second, end of break, cursor blink) or the state changes.
+IDLE_EVENT_WAIT = True
+IDLE_MAX_WAIT = 1.0  # seconds
+
+def next_idle_deadline():
+    now = engine.clock()
+
+    if engine.state == STATE_COUNTDOWN:
+        elapsed = int(now - engine.countdown_start_time)
+        return engine.countdown_start_time + min(elapsed + 1, COUNTDOWN_DURATION)
+
+    if engine.state == STATE_BREAK:
+        elapsed = int(now - engine.break_start_time)
+        return engine.break_start_time + min(elapsed + 1, BREAK_DURATION)
+
+    if engine.state == STATE_TUTORIAL and engine.tutorial_step in (1, 3):
+        return last_cursor_toggle + CURSOR_BLINK_INTERVAL
+
+    return None
+
+def wait_for_events(deadline, redraw_pending):
+    if redraw_pending:
+        return pygame.event.get()
+
+    if deadline is None:
+        timeout = IDLE_MAX_WAIT
+    else:
+        timeout = min(deadline - engine.clock(), IDLE_MAX_WAIT)
 
-running = True
-
-while running:
-    clock.tick(60)
-
-    current_time = time.time()
-
-    # Cursor blinking
-    if current_time - last_cursor_toggle >= CURSOR_BLINK_INTERVAL:
-        cursor_visible = not cursor_visible
-        last_cursor_toggle = current_time
-
-    # ============================
-    # START SCREEN
-    # ============================
-    if game_state == STATE_START:
-
-        start_button_rect, tutorial_button_rect = draw_start_screen()
-
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                write_summary_to_csv()
-                running = False
-
-            elif event.type == pygame.MOUSEBUTTONDOWN:
-                if start_button_rect.collidepoint(event.pos):
-                    create_csv()
-                    game_state = STATE_COUNTDOWN
-                    countdown_start_time = time.time()
-                elif tutorial_button_rect.collidepoint(event.pos):
-                    tutorial_step = 0
-                    tutorial_input = ""
-                    tutorial_feedback = ""
-                    game_state = STATE_TUTORIAL
-
-    # ============================
-    # COUNTDOWN SCREEN
-    # ============================
-    elif game_state == STATE_COUNTDOWN:
-
-        draw_countdown()
-
-        if current_time - countdown_start_time >= 5:
-            task_type = 1  # always start each block with the count task
-            game_state = STATE_RUNNING
-            condition_start_time = time.time()
-            last_switch_time = time.time()
-
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                write_summary_to_csv()
-                running = False
-
-    # ============================
-    # RUNNING EXPERIMENT
-    # ============================
-    elif game_state == STATE_RUNNING:
-
-        # ----- TASK SWITCH -----
-        if current_time - last_switch_time >= duration:
-            switch_task()
-            generate_trial(complexity)
-            user_input = ""
-            last_switch_time = current_time
-            switch_banner_time = current_time
-
-        # ----- END CONDITION -----
-        if current_time - condition_start_time >= TOTAL_TRIAL_TIME:
-
-            current_condition_index += 1
-
-            if current_condition_index >= len(conditions):
-                write_summary_to_csv()
-                game_state = STATE_DONE
+    if timeout <= 0:
+        return pygame.event.get()
+
+    event = pygame.event.wait(math.ceil(timeout * 1000))
+    events = [] if event.type == pygame.NOEVENT else [event]
+    return events + pygame.event.get()
+
+
+# -----------------------------
+# FRAME TIMING (OPT-IN)
+# -----------------------------
+# With FRAME_TIMING on, per-frame durations, dropped frames, draw_* times, event
+# queue depth and key-to-flip latency are recorded (see frame_timing.py), written to
+# session_data/summaries/<session>_timing.csv and summarized on exit.
+FRAME_TIMING = False
+frame_timer = None
+
+def enable_frame_timing():
+    global frame_timer, draw_start_screen, draw_countdown, draw_break_screen
+    global draw_done_screen, draw_tutorial, draw_tutorial_done_screen
+    global draw_interface, draw_interface_dirty
+
+    from frame_timing import FrameTimer
+    frame_timer = FrameTimer(target_fps=60)
+
+    draw_start_screen = frame_timer.wrap(draw_start_screen)
+    draw_countdown = frame_timer.wrap(draw_countdown)
+    draw_break_screen = frame_timer.wrap(draw_break_screen)
+    draw_done_screen = frame_timer.wrap(draw_done_screen)
+    draw_tutorial = frame_timer.wrap(draw_tutorial)
+    draw_tutorial_done_screen = frame_timer.wrap(draw_tutorial_done_screen)
+    draw_interface = frame_timer.wrap(draw_interface)
+    draw_interface_dirty = frame_timer.wrap(draw_interface_dirty)
+
+def write_frame_timing():
+    if CSV_FILE is not None:
+        name = os.path.splitext(os.path.basename(CSV_FILE))[0] + "_timing.csv"
+    else:
+        name = "timing_" + datetime.datetime.now().strftime("%Y%m%d_%H%M%S") + ".csv"
+
+    os.makedirs(SUMMARY_DIR, exist_ok=True)
+    frame_timer.write_csv(os.path.join(SUMMARY_DIR, name))
+
+# -----------------------------
+# INPUT
+# -----------------------------
+start_button_rect = None
+tutorial_button_rect = None
+
+def translate_events(events, received_ns):
+    # Turn pygame events into SessionEngine inputs. pygame does not expose SDL's event
+    # timestamps, so every input is stamped with received_ns, the perf_counter_ns
+    # reading taken right after the events were fetched. A key can have waited in the
+    # queue for up to one poll gap before that.
+    inputs = []
+
+    for event in events:
+        if event.type == pygame.QUIT:
+            inputs.append(INPUT_QUIT)
+
+        elif event.type == pygame.MOUSEBUTTONDOWN and engine.state == STATE_START:
+            if start_button_rect.collidepoint(event.pos):
+                inputs.append(INPUT_START)
+            elif tutorial_button_rect.collidepoint(event.pos):
+                inputs.append(INPUT_TUTORIAL)
+
+        elif event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_RETURN:
+                inputs.append(INPUT_ENTER)
+            elif event.key == pygame.K_BACKSPACE:
+                inputs.append(INPUT_BACKSPACE)
+            elif event.key == pygame.K_SPACE:
+                inputs.append(INPUT_SPACE)
             else:
-                game_state = STATE_BREAK
-                break_start_time = time.time()
+                inputs.append(event.unicode)
+
+    return inputs, [received_ns] * len(inputs)
+
+# -----------------------------
+# LOW-LATENCY INPUT
+# -----------------------------
+# With INPUT_POLLING on, the running screen no longer reads input once per
+# clock.tick(60). Between frames the event queue is polled every INPUT_POLL_INTERVAL
+# seconds and each batch is handed to the engine as soon as it arrives. A key that
+# arrives while a frame is drawn is read by the first poll after the flip. The gap
+# since the previous poll (which spans that draw) bounds how long a key waited
+# unstamped, and is reported with every input. Frames are still drawn at FRAME_RATE.
+# Set INPUT_POLLING = False for the old once-per-frame input.
+INPUT_POLLING = True
+INPUT_POLL_INTERVAL = 0.001
+FRAME_RATE = 60
+
+from frame_timing import percentile
+last_frame_time = None
+input_latencies_ns = []  # poll that read the key -> engine.step() returned (trial row queued)
+input_latency_bounds_ns = []  # previous poll -> engine.step() returned: includes the queue wait
+poll_stats = {"polls": 0, "max_gap_ns": 0, "last_poll_ns": None}
+
+def show_running_screen():
+    if DIRTY_RECT_RENDERING:
+        draw_interface_dirty()
+    else:
+        draw_interface()
+    # Stimulus onset is the first flip that shows a newly generated trial
+    engine.mark_stimulus_onset(time.perf_counter_ns())
+
+def poll_input():
+    # Handle running-screen input as it arrives until the next frame is due
+    global last_frame_time
+
+    now = time.perf_counter()
+    if last_frame_time is None:
+        last_frame_time = now
+    frame_deadline = last_frame_time + 1 / FRAME_RATE
+
+    while engine.running and engine.state == STATE_RUNNING:
+        events = pygame.event.get()
+        received_ns = time.perf_counter_ns()
+
+        # The previous poll may have been before the last frame's draw and flip
+        previous_poll_ns = poll_stats["last_poll_ns"]
+        if previous_poll_ns is None:
+            previous_poll_ns = received_ns
+        poll_stats["polls"] += 1
+        poll_stats["max_gap_ns"] = max(poll_stats["max_gap_ns"], received_ns - previous_poll_ns)
+        poll_stats["last_poll_ns"] = received_ns
+        if frame_timer is not None:
+            frame_timer.events_polled(len(events))
+
+        if events:
+            handle_expose_events(events)
+            inputs, timestamps = translate_events(events, received_ns)
+            engine.step(inputs, timestamps)
+            handled_ns = time.perf_counter_ns()
+            input_latencies_ns.extend(handled_ns - stamp for stamp in timestamps)
+            input_latency_bounds_ns.extend([handled_ns - previous_poll_ns] * len(timestamps))
+
+            if frame_timer is not None:
+                keys = sum(1 for event in events if event.type == pygame.KEYDOWN)
+                frame_timer.keys_handled(received_ns / 1e9, keys)
+
+            # An answer or a task switch replaced the stimulus: show it now, so its
+            # onset is known before the next key arrives
+            if engine.state == STATE_RUNNING and engine.stimulus_onset_ns is None:
+                show_running_screen()
+
+        remaining = frame_deadline - time.perf_counter()
+        if remaining <= 0:
+            break
+        time.sleep(min(INPUT_POLL_INTERVAL, remaining))
+
+    # Late frames push the schedule back instead of bursting to catch up
+    last_frame_time = max(frame_deadline, time.perf_counter() - 1 / FRAME_RATE)
+
+def latency_line(label, latencies_ns):
+    latencies = [latency / 1e6 for latency in latencies_ns]
+    return (
+        f"{label} ms ({len(latencies)} inputs): p50 {percentile(latencies, 0.5):.3f}, "
+        f"p95 {percentile(latencies, 0.95):.3f}, p99 {percentile(latencies, 0.99):.3f}, "
+        f"max {max(latencies):.3f}"
+    )
+
+def input_latency_summary():
+    return "\n".join([
+        latency_line("Poll to log", input_latencies_ns),
+        latency_line("Key to log, upper bound", input_latency_bounds_ns),
+        f"Longest poll gap (including frame draws) {poll_stats['max_gap_ns'] / 1e6:.3f} ms",
+    ])
+
+# -----------------------------
+# MAIN LOOP
+# -----------------------------
+
+def run():
+    global start_button_rect, tutorial_button_rect, cursor_visible, last_cursor_toggle
+
+    last_drawn_state = None
+    redraw_pending = True
+
+    while engine.running:
+
+        # Any other screen overwrites the running layout, so start it from scratch
+        if engine.state != last_drawn_state:
+            invalidate_static_layers()
+            last_drawn_state = engine.state
+            redraw_pending = True
+            # Other screens are not polled, so a block's poll gaps start fresh
+            poll_stats["last_poll_ns"] = None
+
+        # Idle screens sleep until an event or the next deadline; STATE_RUNNING runs at 60 fps
+        idle = IDLE_EVENT_WAIT and engine.state != STATE_RUNNING
+        if idle:
+            deadline = next_idle_deadline()
+            events = wait_for_events(deadline, redraw_pending)
+        elif INPUT_POLLING:
+            # Input was already handled inside poll_input(); the step below only runs timers
+            poll_input()
+            events = []
+        else:
+            clock.tick(60)
+            events = pygame.event.get()
+        received_ns = time.perf_counter_ns()
+        handle_expose_events(events)
+
+        current_time = engine.clock()
+        redraw = (
+            not idle
+            or redraw_pending
+            or len(events) > 0
+            or (deadline is not None and current_time >= deadline)
+        )
+        # Events are handled after drawing, so whatever they change shows next iteration
+        redraw_pending = len(events) > 0
+
+        # Cursor blinking
+        if current_time - last_cursor_toggle >= CURSOR_BLINK_INTERVAL:
+            cursor_visible = not cursor_visible
+            last_cursor_toggle = current_time
+
+        # The running screen is drawn after the engine step, every other screen before it
+        state = engine.state
+
+        if frame_timer is not None:
+            frame_timer.begin_frame(state, engine.current_condition_index + 1, len(events), not idle)
+
+        if redraw:
+            if state == STATE_START:
+                start_button_rect, tutorial_button_rect = draw_start_screen()
+            elif state == STATE_COUNTDOWN:
+                draw_countdown()
+            elif state == STATE_BREAK:
+                draw_break_screen()
+            elif state == STATE_DONE:
+                draw_done_screen()
+            elif state == STATE_TUTORIAL:
+                draw_tutorial()
+            elif state == STATE_TUTORIAL_DONE:
+                draw_tutorial_done_screen()
+
+        if BLOCK_PREFETCH and state in (STATE_COUNTDOWN, STATE_BREAK):
+            prefetch_next_block()
+
+        engine.step(*translate_events(events, received_ns))
+
+        if frame_timer is not None:
+            frame_timer.keys_processed(sum(1 for event in events if event.type == pygame.KEYDOWN))
+
+        if state == STATE_RUNNING:
+            show_running_screen()
+
+        if frame_timer is not None:
+            frame_timer.end_frame()
+
+def shutdown():
+    pygame.quit()
+
+    if trial_logger is not None:
+        close_trial_logger()
+    if frame_timer is not None:
+        write_frame_timing()
+
+    if EXIT_REPORT:
+        print_exit_report()
+
+def print_exit_report():
+    if trial_logger is not None:
+        print(
+            f"Trial logger: {trial_logger.rows_logged} rows, "
+            f"render thread blocked on I/O for {trial_logger.blocked_time * 1000:.2f} ms"
+        )
+
+    print(
+        f"Text cache: {text_cache_stats['hits']} hits, "
+        f"{text_cache_stats['misses']} misses"
+    )
+
+    if input_latencies_ns:
+        print(input_latency_summary())
+
+    if frame_timer is not None:
+        print(frame_timer.summary())
+
+def print_startup_report():
+    total = sum(seconds for step, seconds in startup_times)
+    steps = ", ".join(f"{step} {seconds * 1000:.1f} ms" for step, seconds in startup_times)
+    if FONT_PATH is not None:
+        fonts = "bundled font"
+    else:
+        fonts = "system font scan" if font_cache_misses else "cached font files"
+    print(f"Startup: {steps} (total {total * 1000:.1f} ms, {fonts})")
+
+def main() -> None:
+    init_display()
+    with startup_step("session"):
+        init_session()
+        if FRAME_TIMING:
+            enable_frame_timing()
+
+    if STARTUP_REPORT:
+        print_startup_report()
+
+    run()
+    shutdown()
 
-        # ----- EVENT HANDLING -----
-        for event in pygame.event.get():
+startup_times.append(("imports", time.perf_counter() - IMPORT_START))
 
-            if event.type == pygame.QUIT:
-                write_summary_to_csv()
-                running = False
-
-            elif event.type == pygame.KEYDOWN:
-
-                if event.key == pygame.K_RETURN:
-                    if user_input != "":
-                        correct_answer = compute_answer()
-
-                        try:
-                            response = int(user_input)
-                        except ValueError:
-                            response = -999
-
-                        correct_flag = 1 if response == correct_answer else 0
-                        log_trial(correct_flag, correct_answer, response)
-
-                        generate_trial(complexity)
-                        user_input = ""
-
-                elif event.key == pygame.K_BACKSPACE:
-                    user_input = user_input[:-1]
-
-                elif event.unicode.isdigit():
-                    user_input += event.unicode
-
-        draw_interface(duration)
-    
-    # ============================
-    # BREAK BETWEEN BLOCKS
-    # ============================
-    elif game_state == STATE_BREAK:
-
-        draw_break_screen()
-
-        if current_time - break_start_time >= BREAK_DURATION:
-
-            complexity, duration = conditions[current_condition_index]
-            task_type = 1  # always start each block with the count task
-            generate_trial(complexity)
-
-            condition_start_time = time.time()
-            last_switch_time = time.time()
-            user_input = ""
-
-            game_state = STATE_RUNNING
-
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                write_summary_to_csv()
-                running = False
-
-    # ============================
-    # DONE SCREEN
-    # ============================
-    elif game_state == STATE_DONE:
-
-        draw_done_screen()
-
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                write_summary_to_csv()
-                running = False
-
-    # ============================
-    # TUTORIAL
-    # ============================
-    elif game_state == STATE_TUTORIAL:
-
-        draw_tutorial()
-
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-
-            elif event.type == pygame.KEYDOWN:
-
-                # Explanation steps (0, 2): press SPACE to start practice
-                if tutorial_step in (0, 2):
-                    if event.key == pygame.K_SPACE:
-                        tutorial_step += 1
-                        tutorial_input = ""
-                        tutorial_feedback = ""
-                        # Set task_type for practice
-                        task_type = 1 if tutorial_step == 1 else 2
-                        generate_trial(2)  # complexity 2 for tutorial
-
-                # Practice steps (1, 3): type answer and submit
-                elif tutorial_step in (1, 3):
-
-                    if tutorial_feedback == "correct":
-                        # SPACE to advance after correct answer
-                        if event.key == pygame.K_SPACE:
-                            tutorial_step += 1
-                            tutorial_input = ""
-                            tutorial_feedback = ""
-                            if tutorial_step >= 4:
-                                task_type = 1
-                                game_state = STATE_TUTORIAL_DONE
-                    else:
-                        if event.key == pygame.K_RETURN:
-                            if tutorial_input != "":
-                                correct_answer = compute_answer()
-                                try:
-                                    response = int(tutorial_input)
-                                except ValueError:
-                                    response = -999
-
-                                if response == correct_answer:
-                                    tutorial_feedback = "correct"
-                                else:
-                                    tutorial_feedback = "incorrect"
-                                    tutorial_input = ""
-
-                        elif event.key == pygame.K_BACKSPACE:
-                            tutorial_input = tutorial_input[:-1]
-
-                        elif event.unicode.isdigit():
-                            tutorial_input += event.unicode
-
-    # ============================
-    # TUTORIAL COMPLETE SCREEN
-    # ============================
-    elif game_state == STATE_TUTORIAL_DONE:
-
-        draw_tutorial_done_screen()
-
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-
-            elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_SPACE:
-                    tutorial_step = 0
-                    tutorial_input = ""
-                    tutorial_feedback = ""
-                    game_state = STATE_START
-
-pygame.quit()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
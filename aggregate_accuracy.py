@@ -1,6 +1,12 @@
 import argparse
 import csv
+import hashlib
+import json
+import mmap
+import os
+from array import array
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 
@@ -26,45 +32,285 @@ COMPLEXITY_ORDER = {
     "Hard": 3,
 }
 
+CACHE_VERSION = 1
 
-def aggregate_accuracy(input_folder: Path, output_file: Path) -> None:
-    grouped_results = defaultdict(lambda: {"correct": 0, "attempts": 0})
-    csv_files = sorted(input_folder.glob("*.csv"))
-    participant_ids = {
-        csv_path: index
-        for index, csv_path in enumerate(csv_files, start=1)
-    }
 
-    for csv_path in csv_files:
-        with csv_path.open("r", newline="") as file:
-            reader = csv.DictReader(file)
+def read_session_counts(csv_path: Path) -> dict:
+    """Count correct answers and attempts per (complexity, interval_length) cell."""
+    counts = defaultdict(lambda: [0, 0])
+
+    with csv_path.open("r", newline="") as file:
+        reader = csv.DictReader(file)
+
+        if reader.fieldnames is None:
+            return {}
+
+        missing_columns = REQUIRED_COLUMNS - set(reader.fieldnames)
+        if missing_columns:
+            raise ValueError(
+                f"{csv_path.name} is missing required columns: "
+                f"{', '.join(sorted(missing_columns))}"
+            )
 
-            if reader.fieldnames is None:
+        for row in reader:
+            complexity = (row.get("complexity") or "").strip()
+            interval_length = (row.get("interval_length") or "").strip()
+            correct = (row.get("correct") or "").strip()
+
+            # Ignore blank rows or summary rows appended beside the trial data.
+            if not complexity or not interval_length or correct not in {"0", "1"}:
                 continue
 
-            missing_columns = REQUIRED_COLUMNS - set(reader.fieldnames)
+            complexity_label = COMPLEXITY_LABELS.get(complexity, complexity)
+            cell = counts[(complexity_label, interval_length)]
+            cell[0] += int(correct)
+            cell[1] += 1
+
+    return dict(counts)
+
+
+def read_session_counts_fast(csv_path: Path) -> dict:
+    """Same result as read_session_counts(), parsed straight from a memory-mapped file.
+
+    Only the complexity, interval_length and correct columns are split out of each
+    line; the summary block to the right is never touched and no per-row dicts are
+    built. Files containing quoted fields fall back to the csv module.
+    """
+    counts = {}
+
+    with csv_path.open("rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return {}
+
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if data.find(b'"') != -1:
+                return read_session_counts(csv_path)
+
+            header = data.readline().rstrip(b"\r\n").decode()
+            fieldnames = header.split(",")
+
+            missing_columns = REQUIRED_COLUMNS - set(fieldnames)
             if missing_columns:
                 raise ValueError(
                     f"{csv_path.name} is missing required columns: "
                     f"{', '.join(sorted(missing_columns))}"
                 )
 
-            participant = participant_ids[csv_path]
+            # A duplicated column name resolves to its last occurrence, as in csv.DictReader
+            columns = {name: index for index, name in enumerate(fieldnames)}
+            complexity_index = columns["complexity"]
+            interval_index = columns["interval_length"]
+            correct_index = columns["correct"]
+            max_split = max(complexity_index, interval_index, correct_index) + 1
+
+            for line in iter(data.readline, b""):
+                fields = line.split(b",", max_split)
+                if len(fields) < max_split:
+                    fields += [b""] * (max_split - len(fields))
 
-            for row in reader:
-                complexity = (row.get("complexity") or "").strip()
-                interval_length = (row.get("interval_length") or "").strip()
-                correct = (row.get("correct") or "").strip()
+                complexity = fields[complexity_index].strip()
+                interval_length = fields[interval_index].strip()
+                correct = fields[correct_index].strip()
 
                 # Ignore blank rows or summary rows appended beside the trial data.
-                if not complexity or not interval_length or correct not in {"0", "1"}:
+                if not complexity or not interval_length or correct not in (b"0", b"1"):
                     continue
 
-                complexity_label = COMPLEXITY_LABELS.get(complexity, complexity)
-                key = (participant, complexity_label, interval_length)
-                grouped_results[key]["attempts"] += 1
-                grouped_results[key]["correct"] += int(correct)
+                cell = counts.get((complexity, interval_length))
+                if cell is None:
+                    cell = counts[(complexity, interval_length)] = [0, 0]
+                cell[0] += correct == b"1"
+                cell[1] += 1
+
+    return {
+        (COMPLEXITY_LABELS.get(complexity.decode(), complexity.decode()), interval_length.decode()): cell
+        for (complexity, interval_length), cell in counts.items()
+    }
+
+
+def file_fingerprint(csv_path: Path) -> dict:
+    """Return the size, mtime and content hash used to detect changed session files."""
+    stat = csv_path.stat()
+    return {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": hashlib.sha256(csv_path.read_bytes()).hexdigest(),
+    }
+
+
+def load_cache(cache_file: Path) -> dict:
+    if not cache_file.exists():
+        return {}
+
+    try:
+        with cache_file.open("r") as file:
+            cache = json.load(file)
+    except (OSError, ValueError):
+        # A damaged cache only costs a full re-parse.
+        return {}
+
+    if cache.get("version") != CACHE_VERSION:
+        return {}
+
+    return cache.get("files", {})
+
+
+def save_cache(cache_file: Path, entries: dict) -> None:
+    temp_file = cache_file.with_name(cache_file.name + ".tmp")
+    with temp_file.open("w") as file:
+        json.dump({"version": CACHE_VERSION, "files": entries}, file)
+    temp_file.replace(cache_file)
+
+
+def read_all_session_counts(csv_files: list, jobs: int = 1, fast: bool = False) -> list:
+    # Workers only return per-file partial counts; participant numbers are
+    # assigned by the caller from the sorted file order so --jobs never changes them.
+    reader = read_session_counts_fast if fast else read_session_counts
+
+    if jobs > 1 and len(csv_files) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            chunksize = max(1, len(csv_files) // (jobs * 4))
+            return list(executor.map(reader, csv_files, chunksize=chunksize))
+
+    return [reader(csv_path) for csv_path in csv_files]
+
+
+def read_cached_session_counts(
+    csv_files: list,
+    cache_file: Path,
+    jobs: int = 1,
+    fast: bool = False,
+) -> list:
+    """Like read_all_session_counts(), but only parse files not already in the cache."""
+    cached_entries = load_cache(cache_file)
+    new_entries = {}
+    partials = [None] * len(csv_files)
+    stale = []
+
+    for index, csv_path in enumerate(csv_files):
+        key = str(csv_path.resolve())
+        entry = cached_entries.get(key)
+        stat = csv_path.stat()
+
+        # Matching size and mtime is trusted; otherwise fall back to the
+        # content hash so a touched-but-unchanged file is not re-parsed.
+        if entry is not None and (entry["size"], entry["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+            fingerprint = entry
+        else:
+            fingerprint = file_fingerprint(csv_path)
+            if entry is None or entry["sha256"] != fingerprint["sha256"]:
+                stale.append(index)
+                new_entries[key] = fingerprint
+                continue
+
+        partials[index] = {
+            (complexity_label, interval_length): (correct, attempts)
+            for complexity_label, interval_length, correct, attempts in entry["counts"]
+        }
+        new_entries[key] = {**fingerprint, "counts": entry["counts"]}
+
+    parsed = read_all_session_counts([csv_files[index] for index in stale], jobs, fast)
+    for index, session_counts in zip(stale, parsed):
+        partials[index] = session_counts
+        new_entries[str(csv_files[index].resolve())]["counts"] = [
+            [complexity_label, interval_length, correct, attempts]
+            for (complexity_label, interval_length), (correct, attempts) in session_counts.items()
+        ]
 
+    save_cache(cache_file, new_entries)
+    return partials
+
+
+class AccuracyAccumulator:
+    """Correct/attempt counts for every (participant, complexity, interval_length) cell.
+
+    Participants and cells are mapped to dense integer indices and the counts live in
+    flat ``array('l')`` buffers of ``participants * len(cells)`` entries, so memory per
+    cell is constant. ``cells`` is kept in output order, which turns the final sort into
+    a plain walk over the indices.
+    """
+
+    def __init__(self, participants: int, cells: list):
+        self.participants = participants
+        self.cells = sorted(
+            cells,
+            key=lambda cell: (COMPLEXITY_ORDER.get(cell[0], 999), cell[1], cell[0]),
+        )
+        self.cell_index = {cell: index for index, cell in enumerate(self.cells)}
+        size = participants * len(self.cells)
+        self.correct = array("l", bytes(size * array("l").itemsize))
+        self.attempts = array("l", bytes(size * array("l").itemsize))
+
+    @classmethod
+    def from_partials(cls, partials: list) -> "AccuracyAccumulator":
+        """Build from per-file counts; participant ``n`` is the ``n``-th partial."""
+        cells = set()
+        for session_counts in partials:
+            cells.update(session_counts)
+
+        accumulator = cls(len(partials), list(cells))
+        for participant, session_counts in enumerate(partials, start=1):
+            accumulator.add_session(participant, session_counts)
+        return accumulator
+
+    def add_session(self, participant: int, session_counts: dict) -> None:
+        offset = (participant - 1) * len(self.cells)
+        for cell, (correct, attempts) in session_counts.items():
+            index = offset + self.cell_index[cell]
+            self.correct[index] += correct
+            self.attempts[index] += attempts
+
+    def rows(self):
+        """Yield (participant, complexity, interval_length, attempts, correct) in output order."""
+        index = 0
+        for participant in range(1, self.participants + 1):
+            for complexity_label, interval_length in self.cells:
+                attempts = self.attempts[index]
+                if attempts:
+                    yield participant, complexity_label, interval_length, attempts, self.correct[index]
+                index += 1
+
+
+def build_accumulator(
+    input_folder: Path,
+    jobs: int = 1,
+    cache_file: Path = None,
+    fast: bool = False,
+) -> AccuracyAccumulator:
+    csv_files = sorted(input_folder.glob("*.csv"))
+
+    if cache_file is None:
+        partials = read_all_session_counts(csv_files, jobs, fast)
+    else:
+        partials = read_cached_session_counts(csv_files, cache_file, jobs, fast)
+
+    return AccuracyAccumulator.from_partials(partials)
+
+
+def store_accuracy_rows(input_folder: Path, store_file: Path) -> list:
+    """Ingest new or changed files into the SQLite store, then return its accuracy rows.
+
+    The rows are read in full before anything is written, so a failed ingest leaves
+    an existing output file untouched.
+    """
+    # Imported here because trial_store.py builds on this module
+    from trial_store import accuracy_rows, connect, ingest_folder
+
+    connection = connect(store_file)
+    try:
+        ingest_folder(connection, input_folder, prune=True)
+        return list(accuracy_rows(connection, input_folder))
+    finally:
+        connection.close()
+
+
+def accumulator_accuracy_rows(accumulator: AccuracyAccumulator):
+    """Yield participant_accuracy.csv rows from an accumulator."""
+    for participant, complexity, interval_length, attempts, correct in accumulator.rows():
+        yield participant, complexity, interval_length, attempts, correct / attempts
+
+
+def write_accuracy_rows(rows, output_file: Path) -> None:
     with output_file.open("w", newline="") as file:
         writer = csv.writer(file)
         writer.writerow([
@@ -75,26 +321,32 @@ def aggregate_accuracy(input_folder: Path, output_file: Path) -> None:
             "accuracy",
         ])
 
-        sorted_rows = sorted(
-            grouped_results.items(),
-            key=lambda item: (
-                item[0][0],
-                COMPLEXITY_ORDER.get(item[0][1], 999),
-                item[0][2],
-            ),
-        )
-
-        for (participant, complexity, interval_length), counts in sorted_rows:
-            accuracy = counts["correct"] / counts["attempts"]
+        for participant, complexity, interval_length, attempts, accuracy in rows:
             writer.writerow([
                 participant,
                 complexity,
                 interval_length,
-                counts["attempts"],
+                attempts,
                 accuracy,
             ])
 
 
+def aggregate_accuracy(
+    input_folder: Path,
+    output_file: Path,
+    jobs: int = 1,
+    cache_file: Path = None,
+    fast: bool = False,
+    store_file: Path = None,
+) -> None:
+    if store_file is not None:
+        rows = store_accuracy_rows(input_folder, store_file)
+    else:
+        rows = accumulator_accuracy_rows(build_accumulator(input_folder, jobs, cache_file, fast))
+
+    write_accuracy_rows(rows, output_file)
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(
         description="Combine participant CSV files into one accuracy summary CSV."
@@ -111,6 +363,28 @@ def main() -> None:
         default="participant_accuracy.csv",
         help="Output CSV file path. Default: participant_accuracy.csv",
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes used to read session files. Default: 1",
+    )
+    parser.add_argument(
+        "--cache",
+        default=None,
+        help="JSON file of per-file counts; only new or changed session files are re-read.",
+    )
+    parser.add_argument(
+        "--fast",
+        action="store_true",
+        help="Use the memory-mapped reader that only parses the needed columns.",
+    )
+    parser.add_argument(
+        "--store",
+        default=None,
+        help="SQLite trial store (see trial_store.py); new or changed files are ingested "
+        "and the output comes from one query over the store.",
+    )
     args = parser.parse_args()
 
     input_folder = Path(args.input_folder)
@@ -119,7 +393,20 @@ def main() -> None:
     if not input_folder.exists() or not input_folder.is_dir():
         raise FileNotFoundError(f"Input folder not found: {input_folder}")
 
-    aggregate_accuracy(input_folder, output_file)
+    if args.jobs < 1:
+        raise ValueError("--jobs must be at least 1")
+
+    cache_file = Path(args.cache) if args.cache else None
+    store_file = Path(args.store) if args.store else None
+
+    aggregate_accuracy(
+        input_folder,
+        output_file,
+        jobs=args.jobs,
+        cache_file=cache_file,
+        fast=args.fast,
+        store_file=store_file,
+    )
 
 
 if __name__ == "__main__":
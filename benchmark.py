@@ -0,0 +1,263 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from aggregate_accuracy import aggregate_accuracy
+from generate_sessions import generate_sessions
+from session_engine import COMPLEXITIES, SessionEngine, compute_answer
+
+
+BASELINE_VERSION = 1
+CORPUS_SIZES = [100, 10000, 100000]
+DEFAULT_THRESHOLD = 0.10  # relative slowdown reported as a regression
+
+
+# -----------------------------
+# SYNTHETIC CORPUS
+# -----------------------------
+def synthetic_corpus(root: Path, files: int) -> Path:
+    """Return a folder of ``files`` synthetic sessions, writing it only if missing."""
+    folder = root / f"corpus_{files}"
+    marker = folder / ".complete"
+    if marker.exists():
+        return folder
+
+    # The padded in-place summary makes the readers skip the summary block, as on
+    # sessions recorded before the sidecar summary
+    generate_sessions(folder, files, seed=files, summary="in-place", jobs=os.cpu_count() or 1)
+    marker.touch()
+    return folder
+
+
+# -----------------------------
+# BENCHMARKS
+# -----------------------------
+def timed(function, repeat):
+    # Median wall time of repeat calls, in seconds
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def bench_aggregate(results: dict, corpus_root: Path, sizes: list, repeat: int) -> None:
+    for size in sizes:
+        folder = synthetic_corpus(corpus_root, size)
+        output = corpus_root / "participant_accuracy.csv"
+        # Large corpora take long enough that one run is already stable
+        runs = repeat if size <= 10000 else 1
+
+        for name, fast in (("aggregate", False), ("aggregate_fast", True)):
+            seconds = timed(lambda: aggregate_accuracy(folder, output, fast=fast), runs)
+            results[f"{name}_{size}_files"] = {
+                "value": seconds,
+                "unit": "s",
+                "higher_is_better": False,
+            }
+
+
+def bench_trials(results: dict, count: int, repeat: int) -> None:
+    engine = SessionEngine(clock=lambda: 0.0, seed=0)
+
+    for complexity in COMPLEXITIES:
+        def run():
+            for index in range(count):
+                engine.task_type = 1 + index % 2
+                engine.generate_trial(complexity)
+                engine.compute_answer()
+
+        seconds = timed(run, repeat)
+        results[f"generate_trial_complexity_{complexity}"] = {
+            "value": count / seconds,
+            "unit": "trials/s",
+            "higher_is_better": True,
+        }
+
+    stimuli = []
+    for index in range(count):
+        engine.generate_trial(COMPLEXITIES[index % len(COMPLEXITIES)])
+        stimuli.append((engine.digit_string, engine.target_digits, 1 + index % 2))
+
+    def count_answers():
+        for digit_string, target_digits, task_type in stimuli:
+            compute_answer(digit_string, target_digits, task_type)
+
+    seconds = timed(count_answers, repeat)
+    results["compute_answer"] = {
+        "value": count / seconds,
+        "unit": "calls/s",
+        "higher_is_better": True,
+    }
+
+
+def load_experiment() -> dict:
+    """Open the experiment's window headlessly and return the module's globals."""
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    import MIE237_experiment
+
+    MIE237_experiment.init_display()
+    MIE237_experiment.init_session()
+    return vars(MIE237_experiment)
+
+
+def bench_draw(results: dict, seconds: float) -> None:
+    experiment = load_experiment()
+    engine = experiment["engine"]
+    now = engine.clock()
+
+    def frames_per_second(draw, state, before_frame=None, **fields):
+        engine.state = state
+        for name, value in fields.items():
+            setattr(engine, name, value)
+        experiment["invalidate_static_layers"]()
+
+        frames = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < seconds:
+            if before_frame is not None:
+                before_frame()
+            draw()
+            frames += 1
+        return frames / (time.perf_counter() - start)
+
+    def new_trial():
+        engine.generate_trial(engine.complexity)
+
+    cases = [
+        ("draw_start_screen", experiment["STATE_START"], None, {}),
+        ("draw_countdown", experiment["STATE_COUNTDOWN"], None, {"countdown_start_time": now}),
+        ("draw_break_screen", experiment["STATE_BREAK"], None, {"break_start_time": now}),
+        ("draw_done_screen", experiment["STATE_DONE"], None, {}),
+        ("draw_tutorial", experiment["STATE_TUTORIAL"], None, {"tutorial_step": 1}),
+        ("draw_tutorial_done_screen", experiment["STATE_TUTORIAL_DONE"], None, {}),
+        ("draw_interface", experiment["STATE_RUNNING"], new_trial, {"condition_start_time": now}),
+        ("draw_interface_dirty", experiment["STATE_RUNNING"], new_trial, {"condition_start_time": now}),
+    ]
+    for name, state, before_frame, fields in cases:
+        results[f"{name}_fps"] = {
+            "value": frames_per_second(experiment[name], state, before_frame, **fields),
+            "unit": "frames/s",
+            "higher_is_better": True,
+        }
+
+
+# -----------------------------
+# BASELINES
+# -----------------------------
+def environment() -> dict:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list:
+    """Return (name, baseline value, current value, relative change) for each regression."""
+    regressions = []
+    for name, result in current["results"].items():
+        old = baseline["results"].get(name)
+        if old is None or old["value"] <= 0:
+            continue
+
+        change = (result["value"] - old["value"]) / old["value"]
+        worse = -change if result["higher_is_better"] else change
+        if worse > threshold:
+            regressions.append((name, old["value"], result["value"], change))
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark aggregation, trial generation and headless rendering."
+    )
+    parser.add_argument(
+        "--output",
+        default=None,
+        help="Write the results to this JSON file (e.g. a new baseline).",
+    )
+    parser.add_argument(
+        "--compare",
+        default=None,
+        help="Baseline JSON file to compare against; exits with status 1 on a regression.",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help=f"Relative slowdown counted as a regression. Default: {DEFAULT_THRESHOLD}",
+    )
+    parser.add_argument(
+        "--only",
+        nargs="+",
+        choices=["aggregate", "trials", "draw"],
+        default=["aggregate", "trials", "draw"],
+        help="Benchmark groups to run. Default: all",
+    )
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        type=int,
+        default=CORPUS_SIZES,
+        help="Synthetic corpus sizes in session files. Default: 100 10000 100000",
+    )
+    parser.add_argument(
+        "--corpus-dir",
+        default=None,
+        help="Keep the synthetic corpora here and reuse them between runs. Default: a temporary folder",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per timing (median). Default: 3")
+    parser.add_argument("--trials", type=int, default=50000, help="Trials per generation timing. Default: 50000")
+    parser.add_argument("--draw-seconds", type=float, default=1.0, help="Seconds per draw_* timing. Default: 1.0")
+    args = parser.parse_args()
+
+    results = {}
+
+    if "aggregate" in args.only:
+        if args.corpus_dir is not None:
+            bench_aggregate(results, Path(args.corpus_dir), args.sizes, args.repeat)
+        else:
+            with tempfile.TemporaryDirectory() as corpus_dir:
+                bench_aggregate(results, Path(corpus_dir), args.sizes, args.repeat)
+
+    if "trials" in args.only:
+        bench_trials(results, args.trials, args.repeat)
+
+    if "draw" in args.only:
+        bench_draw(results, args.draw_seconds)
+
+    current = {"version": BASELINE_VERSION, "environment": environment(), "results": results}
+
+    for name, result in results.items():
+        print(f"{name:40s} {result['value']:14.4f} {result['unit']}")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(current, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        if baseline.get("version") != BASELINE_VERSION:
+            raise ValueError(f"{args.compare} is not a version {BASELINE_VERSION} baseline")
+
+        regressions = compare(baseline, current, args.threshold)
+        for name, old, new, change in regressions:
+            print(f"REGRESSION {name}: {old:.4f} -> {new:.4f} ({change:+.1%})")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
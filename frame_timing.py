@@ -0,0 +1,189 @@
+import csv
+import time
+from functools import wraps
+
+
+COLUMNS = [
+    "frame",
+    "state",
+    "block",
+    "frame_ms",
+    "draw_function",
+    "draw_ms",
+    "queue_depth",
+    "dropped_frames",
+    "keys",
+    "key_latency_ms",
+    "updated",
+]
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class FrameTimer:
+    """Opt-in frame timing and input latency instrumentation for the pygame loop.
+
+    Each main-loop iteration calls ``begin_frame()`` once its events are fetched,
+    ``keys_processed()`` after the engine handled them and ``end_frame()`` at the end.
+    An input poll between frames reports each batch it read with ``events_polled()``.
+    Draw functions wrapped with ``wrap()`` record how long they took (including their
+    flip/update) and when the frame reached the screen; a draw that found nothing to
+    push calls ``no_update()``. One row is kept per drawn frame:
+
+    - ``frame_ms``: time since the previous drawn frame
+    - ``queue_depth``: events read for this frame, or the largest batch read by a poll
+      since the previous frame
+    - ``dropped_frames``: whole frame periods missed, only counted between ``paced`` frames
+    - ``key_latency_ms``: longest time from a key event being read to the first screen
+      update after it was handled, for keys shown by this frame or by a draw between
+      it and the previous frame
+    - ``updated``: 0 if the draw pushed nothing to the screen (the loop still kept pace)
+    """
+
+    def __init__(self, target_fps=60, clock=time.perf_counter):
+        self.frame_period = 1 / target_fps
+        self.clock = clock
+        self.rows = []
+        self.draw_totals = {}  # draw function -> [total seconds, calls]
+        self.key_latencies = []
+        self.paced_frame_ms = []
+
+        self._last_flip = None
+        self._last_paced = False
+        self._pending_keys = []  # (time read, time handled)
+        self._polled_depth = 0  # largest event batch read by a poll since the last frame
+        self._shown_latencies = []  # keys shown by draws between frames
+        self._updated = True
+        self._frame = None
+
+    def wrap(self, function):
+        name = function.__name__
+
+        @wraps(function)
+        def timed(*args, **kwargs):
+            self._updated = True
+            start = self.clock()
+            result = function(*args, **kwargs)
+            end = self.clock()
+
+            if self._frame is not None:
+                self._frame["draw_function"] = name
+                self._frame["draw_ms"] = (end - start) * 1000
+                self._frame["flip_time"] = end
+                self._frame["updated"] = self._updated
+            elif self._updated:
+                # Drawn between frames (by an input poll): the keys handled so far are
+                # on screen now; they are reported with the next frame's row
+                self._shown_latencies.extend(self._keys_shown(end))
+
+            totals = self.draw_totals.setdefault(name, [0.0, 0])
+            totals[0] += end - start
+            totals[1] += 1
+            return result
+
+        return timed
+
+    def begin_frame(self, state, block, queue_depth, paced):
+        self._frame = {
+            "state": state,
+            "block": block,
+            "queue_depth": max(queue_depth, self._polled_depth),
+            "paced": paced,
+            "read_time": self.clock(),
+            "flip_time": None,
+            "updated": False,
+        }
+        self._polled_depth = 0
+
+    def events_polled(self, count):
+        """Record the size of an event batch read by an input poll between frames."""
+        self._polled_depth = max(self._polled_depth, count)
+
+    def no_update(self):
+        """Called by a wrapped draw function that found nothing to push to the screen."""
+        self._updated = False
+
+    def _keys_shown(self, flip_time):
+        latencies = [flip_time - read for read, handled in self._pending_keys if handled <= flip_time]
+        self._pending_keys = [key for key in self._pending_keys if key[1] > flip_time]
+        return latencies
+
+    def keys_processed(self, count):
+        if self._frame is not None:
+            self.keys_handled(self._frame["read_time"], count)
+
+    def keys_handled(self, read_time, count):
+        """Record keys read at read_time and handled now, e.g. by an input poll between frames."""
+        if count:
+            self._pending_keys.extend([(read_time, self.clock())] * count)
+
+    def end_frame(self):
+        frame, self._frame = self._frame, None
+        if frame is None or frame["flip_time"] is None:
+            return
+
+        flip_time = frame["flip_time"]
+        frame_ms = 0.0
+        dropped = 0
+        if self._last_flip is not None:
+            duration = flip_time - self._last_flip
+            frame_ms = duration * 1000
+            # The first paced frame after an idle screen is not a missed frame
+            if frame["paced"] and self._last_paced:
+                dropped = max(0, round(duration / self.frame_period) - 1)
+                self.paced_frame_ms.append(frame_ms)
+        self._last_flip = flip_time
+        self._last_paced = frame["paced"]
+
+        # Keys only reach the screen with a draw that actually updated it
+        latencies, self._shown_latencies = self._shown_latencies, []
+        if frame["updated"]:
+            latencies.extend(self._keys_shown(flip_time))
+        self.key_latencies.extend(latencies)
+
+        self.rows.append([
+            len(self.rows) + 1,
+            frame["state"],
+            frame["block"],
+            round(frame_ms, 3),
+            frame["draw_function"],
+            round(frame["draw_ms"], 3),
+            frame["queue_depth"],
+            dropped,
+            len(latencies),
+            round(max(latencies) * 1000, 3) if latencies else "",
+            1 if frame["updated"] else 0,
+        ])
+
+    def write_csv(self, path):
+        with open(path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(COLUMNS)
+            writer.writerows(self.rows)
+
+    def summary(self):
+        paced = self.paced_frame_ms
+        lines = [
+            f"Frames: {len(self.rows)} ({sum(1 for row in self.rows if not row[10])} without a "
+            f"screen update), dropped: {sum(row[7] for row in self.rows)}",
+        ]
+        if paced:
+            lines.append(
+                f"Paced frame ms: mean {sum(paced) / len(paced):.2f}, "
+                f"p95 {percentile(paced, 0.95):.2f}, p99 {percentile(paced, 0.99):.2f}, "
+                f"max {max(paced):.2f}"
+            )
+        for name, (total, calls) in sorted(self.draw_totals.items()):
+            lines.append(f"  {name}: {calls} calls, mean {total / calls * 1000:.3f} ms")
+        if self.key_latencies:
+            latencies = [latency * 1000 for latency in self.key_latencies]
+            lines.append(
+                f"Key to flip ms: p50 {percentile(latencies, 0.5):.2f}, "
+                f"p95 {percentile(latencies, 0.95):.2f}, max {max(latencies):.2f}"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,384 @@
+import argparse
+import datetime
+import json
+import math
+import os
+import random
+import time
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from session_engine import (
+    BREAK_DURATION,
+    COMPLEXITIES,
+    COUNTDOWN_DURATION,
+    INTERVALS,
+    TOTAL_TRIAL_TIME,
+    TRIAL_COLUMNS,
+    make_conditions,
+)
+
+
+# Default model, fitted to the sessions in session_data/:
+# (complexity, interval) -> (accuracy, mean seconds per response)
+DEFAULT_MODEL = {
+    (1, 10): (0.90, 2.75),
+    (1, 20): (0.91, 2.55),
+    (1, 30): (0.92, 2.45),
+    (2, 10): (0.78, 4.65),
+    (2, 20): (0.87, 4.20),
+    (2, 30): (0.86, 4.00),
+    (3, 10): (0.66, 6.35),
+    (3, 20): (0.69, 6.00),
+    (3, 30): (0.79, 5.75),
+}
+DEFAULT_SWITCH_COST = 0.05  # accuracy lost on the first trial after a task switch
+DEFAULT_PARTICIPANT_SD = 0.5  # between-participant SD of accuracy, on the logit scale
+RESPONSE_TIME_SHAPE = 4  # response times are Erlang (integer-shape gamma) distributed
+
+LEGACY_COLUMNS = TRIAL_COLUMNS[:7]
+SUMMARY_HEADER = ["Complexity", "Task Type", "Total Completed", "Correctly Completed", "Accuracy (%)"]
+MALFORMED_KINDS = ["truncated", "non_numeric", "blank", "garbage"]
+START_TIME = datetime.datetime(2026, 1, 1)
+
+
+def load_model(model_file: Path) -> dict:
+    """Read a JSON model of the form {"<complexity>,<interval>": [accuracy, seconds]}.
+
+    Cells missing from the file keep their DEFAULT_MODEL values.
+    """
+    model = dict(DEFAULT_MODEL)
+    with model_file.open() as file:
+        for key, (accuracy, seconds) in json.load(file).items():
+            complexity, interval = (int(part) for part in key.split(","))
+            if complexity not in COMPLEXITIES or interval not in INTERVALS:
+                raise ValueError(f"{model_file}: unknown condition {key}")
+            model[(complexity, interval)] = (float(accuracy), float(seconds))
+    return model
+
+
+def count_distributions() -> dict:
+    # Cumulative Binomial(10, complexity / 10) probabilities of the target count
+    distributions = {}
+    for complexity in COMPLEXITIES:
+        p = complexity / 10
+        cumulative = []
+        total = 0.0
+        for count in range(11):
+            total += math.comb(10, count) * p ** count * (1 - p) ** (10 - count)
+            cumulative.append(total)
+        distributions[complexity] = cumulative
+    return distributions
+
+
+COUNT_CDF = count_distributions()
+
+
+def session_filename(index: int) -> str:
+    # One second apart, so aggregate_accuracy numbers participants in index order
+    timestamp = START_TIME + datetime.timedelta(seconds=index)
+    return f"results_{timestamp:%Y%m%d_%H%M%S}.csv"
+
+
+def session_rows(rng, model, switch_cost, participant_sd, legacy_columns):
+    """Return one session's trial rows, already joined with commas, and its summary data."""
+    summary = {(c, t): [0, 0] for c in COMPLEXITIES for t in (1, 2)}
+    rows = []
+
+    skill = rng.gauss(0.0, participant_sd)
+    speed = math.exp(rng.gauss(0.0, participant_sd / 2))
+    session_ns = rng.randrange(10 ** 12, 10 ** 13)
+
+    random_value = rng.random
+    trial = 0
+    block_start = COUNTDOWN_DURATION
+
+    for complexity, interval in make_conditions(rng):
+        base_accuracy, mean_seconds = model[(complexity, interval)]
+        logit = math.log(base_accuracy / (1 - base_accuracy)) + skill
+        accuracy = 1 / (1 + math.exp(-logit))
+        scale = -mean_seconds * speed / RESPONSE_TIME_SHAPE
+        cdf = COUNT_CDF[complexity]
+
+        task_type = 1
+        onset = 0.0
+        last_switch = 0.0
+        next_switch = interval
+        switch_pending = False
+
+        while True:
+            # Sum of RESPONSE_TIME_SHAPE exponentials, much cheaper than gammavariate()
+            product = 1.0 - random_value()
+            for _ in range(RESPONSE_TIME_SHAPE - 1):
+                product *= 1.0 - random_value()
+            response = onset + scale * math.log(product)
+
+            # A switch drops the unanswered trial and shows a new one
+            if next_switch < TOTAL_TRIAL_TIME and response >= next_switch:
+                task_type = 3 - task_type
+                onset = last_switch = next_switch
+                next_switch += interval
+                switch_pending = True
+                continue
+            if response >= TOTAL_TRIAL_TIME:
+                break
+
+            u = rng.random()
+            if task_type == 2:
+                # Task 2 never shows a stimulus without a target digit
+                u = cdf[0] + u * (1 - cdf[0])
+            targets = min(bisect_right(cdf, u), 10)
+            actual = targets if task_type == 1 else 10 - targets
+
+            p_correct = accuracy - switch_cost if switch_pending else accuracy
+            correct = 1 if rng.random() < p_correct else 0
+            if correct:
+                answer = actual
+            else:
+                answer = actual + rng.choice((-1, 1)) if 0 < actual < 10 else (1 if actual == 0 else 9)
+
+            trial += 1
+            cell = summary[(complexity, task_type)]
+            cell[0] += 1
+            cell[1] += correct
+
+            if legacy_columns:
+                rows.append(f"{trial},{complexity},{interval},{task_type},{actual},{answer},{correct}")
+            else:
+                onset_ns = session_ns + int((block_start + onset) * 1e9)
+                response_ns = session_ns + int((block_start + response) * 1e9)
+                rows.append(
+                    f"{trial},{complexity},{interval},{task_type},{actual},{answer},{correct},"
+                    f"{onset_ns},{response_ns},{(response_ns - onset_ns) / 1e6},"
+                    f"{(response - last_switch) * 1000:.6f},{int(switch_pending)}"
+                )
+
+            switch_pending = False
+            onset = response
+
+        block_start += TOTAL_TRIAL_TIME + BREAK_DURATION
+
+    return rows, summary
+
+
+def summary_rows(summary):
+    rows = []
+    for (complexity, task_type), (total, correct) in summary.items():
+        accuracy = round((correct / total) * 100, 2) if total > 0 else 0
+        rows.append([complexity, task_type, total, correct, accuracy])
+    return rows
+
+
+def add_in_place_summary(header, rows, summary):
+    # Same layout as write_legacy_summary() in MIE237_experiment.py
+    width = len(header)
+    start = width + 2
+    max_columns = start + len(SUMMARY_HEADER) + 1
+
+    lines = [",".join(header)] + rows
+    while len(lines) < 2 + len(summary):
+        lines.append("")
+
+    # The first lines carry the summary block, the rest only padding
+    blocks = [["===== SUMMARY ====="], SUMMARY_HEADER] + summary_rows(summary)
+    padded = []
+    for index, line in enumerate(lines):
+        fields = line.split(",") if line else []
+        fields += [""] * (max_columns - len(fields))
+        if index < len(blocks):
+            for offset, value in enumerate(blocks[index]):
+                fields[start + offset] = str(value)
+        padded.append(",".join(fields))
+        if index + 1 == len(blocks):
+            break
+
+    for line in lines[len(padded):]:
+        padded.append(line + "," * (max_columns - 1 - line.count(",")))
+    return padded
+
+
+def malformed_row(rng, width):
+    kind = rng.choice(MALFORMED_KINDS)
+    if kind == "truncated":
+        return f"{rng.randrange(1, 500)},{rng.choice(COMPLEXITIES)}"
+    if kind == "non_numeric":
+        fields = ["?"] * width
+        fields[1] = str(rng.choice(COMPLEXITIES))
+        fields[2] = str(rng.choice(INTERVALS))
+        return ",".join(fields)
+    if kind == "blank":
+        return "," * (width - 1)
+    return "#corrupted " + "".join(rng.choice("abcdef0123456789") for _ in range(16))
+
+
+def write_sessions(args):
+    """Write sessions start..stop-1 into folder; run in a worker process."""
+    folder, start, stop, seed, model, options = args
+    header = LEGACY_COLUMNS if options["legacy_columns"] else TRIAL_COLUMNS
+    trials = 0
+
+    for index in range(start, stop):
+        rng = random.Random(seed * 1_000_000_007 + index)
+        rows, summary = session_rows(
+            rng,
+            model,
+            options["switch_cost"],
+            options["participant_sd"],
+            options["legacy_columns"],
+        )
+        trials += len(rows)
+
+        if options["malformed_rate"] > 0:
+            # Extra rows that aggregate_accuracy must skip; the valid rows are unchanged
+            injected = []
+            for row in rows:
+                injected.append(row)
+                if rng.random() < options["malformed_rate"]:
+                    injected.append(malformed_row(rng, len(header)))
+            rows = injected
+
+        name = session_filename(index)
+        if options["summary"] == "in-place":
+            lines = add_in_place_summary(header, rows, summary)
+        else:
+            lines = [",".join(header)] + rows
+            if options["summary"] == "sidecar":
+                summary_dir = folder / "summaries"
+                lines_summary = [",".join(SUMMARY_HEADER)]
+                lines_summary += [",".join(map(str, row)) for row in summary_rows(summary)]
+                with (summary_dir / (name[:-4] + "_summary.csv")).open("w", newline="") as file:
+                    file.write("\r\n".join(lines_summary) + "\r\n")
+
+        with (folder / name).open("w", newline="") as file:
+            file.write("\r\n".join(lines) + "\r\n")
+
+    return trials
+
+
+def generate_sessions(
+    output_folder: Path,
+    participants: int,
+    seed: int = 0,
+    model: dict = None,
+    switch_cost: float = DEFAULT_SWITCH_COST,
+    participant_sd: float = DEFAULT_PARTICIPANT_SD,
+    summary: str = "sidecar",
+    legacy_columns: bool = False,
+    malformed_rate: float = 0.0,
+    jobs: int = 1,
+    chunk_size: int = 1000,
+) -> int:
+    """Write one synthetic session file per participant and return the number of trials.
+
+    Each session is seeded from (seed, participant index), so the output does not
+    depend on ``jobs`` or ``chunk_size``.
+    """
+    output_folder.mkdir(parents=True, exist_ok=True)
+    if summary == "sidecar":
+        (output_folder / "summaries").mkdir(exist_ok=True)
+
+    options = {
+        "switch_cost": switch_cost,
+        "participant_sd": participant_sd,
+        "summary": summary,
+        "legacy_columns": legacy_columns,
+        "malformed_rate": malformed_rate,
+    }
+    model = model if model is not None else DEFAULT_MODEL
+    chunks = [
+        (output_folder, start, min(start + chunk_size, participants), seed, model, options)
+        for start in range(0, participants, chunk_size)
+    ]
+
+    if jobs == 1:
+        return sum(map(write_sessions, chunks))
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        return sum(executor.map(write_sessions, chunks))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Write synthetic session CSV files for scale testing."
+    )
+    parser.add_argument("output_folder", help="Folder to write the session files into.")
+    parser.add_argument(
+        "--participants",
+        type=int,
+        default=1000,
+        help="Number of session files (one per participant). Default: 1000",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Random seed. Default: 0")
+    parser.add_argument(
+        "--model",
+        default=None,
+        help='JSON file of {"<complexity>,<interval>": [accuracy, seconds per response]}.',
+    )
+    parser.add_argument(
+        "--switch-cost",
+        type=float,
+        default=DEFAULT_SWITCH_COST,
+        help=f"Accuracy lost on the first trial after a task switch. Default: {DEFAULT_SWITCH_COST}",
+    )
+    parser.add_argument(
+        "--participant-sd",
+        type=float,
+        default=DEFAULT_PARTICIPANT_SD,
+        help=f"Between-participant variability (logit accuracy). Default: {DEFAULT_PARTICIPANT_SD}",
+    )
+    parser.add_argument(
+        "--summary",
+        choices=["in-place", "sidecar", "none"],
+        default="sidecar",
+        help="Where the per-session summary goes. Default: sidecar (summaries/, as the "
+        "experiment writes it); in-place is the LEGACY_IN_PLACE_SUMMARY layout",
+    )
+    parser.add_argument(
+        "--legacy-columns",
+        action="store_true",
+        help="Write only the original seven trial columns.",
+    )
+    parser.add_argument(
+        "--malformed-rate",
+        type=float,
+        default=0.0,
+        help="Chance of inserting a malformed row after each trial row. Default: 0",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of worker processes. Default: number of CPUs",
+    )
+    args = parser.parse_args()
+
+    if args.participants < 0:
+        raise ValueError("--participants must not be negative")
+    if args.jobs < 1:
+        raise ValueError("--jobs must be at least 1")
+    if args.participants > 10 ** 7:
+        raise ValueError("--participants is limited to 10,000,000 (one file name per second)")
+
+    model = load_model(Path(args.model)) if args.model else None
+
+    start = time.perf_counter()
+    trials = generate_sessions(
+        Path(args.output_folder),
+        args.participants,
+        seed=args.seed,
+        model=model,
+        switch_cost=args.switch_cost,
+        participant_sd=args.participant_sd,
+        summary=args.summary,
+        legacy_columns=args.legacy_columns,
+        malformed_rate=args.malformed_rate,
+        jobs=args.jobs,
+    )
+    elapsed = time.perf_counter() - start
+
+    print(f"Wrote {args.participants} sessions, {trials} trials to {args.output_folder} in {elapsed:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
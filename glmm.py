@@ -0,0 +1,338 @@
+import argparse
+import csv
+import math
+import time
+from pathlib import Path
+
+import numpy as np
+
+from resampling import CellTable, load_cell_table
+from rm_anova import chi2_sf
+
+
+SIGMA_BOUNDS = (1e-4, 10.0)  # search range for the random-intercept SD (logit scale)
+SIGMA_TOLERANCE = 1e-5       # on log(sigma)
+PIRLS_TOLERANCE = 1e-10
+PIRLS_MAX_ITERATIONS = 100
+
+
+# -----------------------------
+# DATA
+# -----------------------------
+# Every trial in one participant's cell has the same linear predictor, so the
+# trial-level Bernoulli likelihood only depends on each cell's (correct, attempts).
+# Fitting on those counts gives exactly the trial-level fit on far fewer rows.
+class BinomialData:
+    """Correct/attempt counts per observed (participant, cell) with the fixed-effects design.
+
+    Both design matrices are kept implicit: the fixed-effects row of an observation is
+    ``cell_design[cell]`` and its random-intercept column is ``group``, the participant
+    index. Products with them are bincounts, never dense (rows × columns) matrices.
+    """
+
+    def __init__(self, table: CellTable):
+        participants, complexities, intervals = table.attempts.shape
+        self.columns, cell_design = treatment_design(table.complexities, table.intervals)
+
+        attempts = table.attempts.reshape(participants, -1)
+        correct = np.rint(np.nan_to_num(table.accuracy).reshape(participants, -1) * attempts)
+        group, cell = np.nonzero(attempts)
+
+        # Participants with no trials at all carry no information; renumber the rest
+        used, self.group = np.unique(group, return_inverse=True)
+        self.participants = len(used)
+        self.cell = cell
+        self.correct = correct[group, cell].astype(np.float64)
+        self.attempts = attempts[group, cell].astype(np.float64)
+        self.cell_design = cell_design
+        self.cell_names = [(c, i) for c in table.complexities for i in table.intervals]
+
+    @property
+    def trials(self) -> int:
+        return int(self.attempts.sum())
+
+    def linear_predictor(self, beta, b):
+        return (self.cell_design @ beta)[self.cell] + b[self.group]
+
+    def group_sums(self, values):
+        return np.bincount(self.group, weights=values, minlength=self.participants)
+
+    def cell_sums(self, values):
+        return np.bincount(self.cell, weights=values, minlength=len(self.cell_design))
+
+    def grid_sums(self, values):
+        """(participants, cells) sums of a per-row quantity."""
+        cells = len(self.cell_design)
+        sums = np.bincount(self.group * cells + self.cell, weights=values, minlength=self.participants * cells)
+        return sums.reshape(self.participants, cells)
+
+
+def treatment_design(complexities: list, intervals: list):
+    """Intercept, complexity and interval dummies and their interaction (first level = reference).
+
+    Returns (column names, design rows for each complexity × interval cell in row-major order).
+    """
+    columns = ["(Intercept)"]
+    columns += [f"complexity{level}" for level in complexities[1:]]
+    columns += [f"interval_length{level}" for level in intervals[1:]]
+    columns += [
+        f"complexity{c}:interval_length{i}" for c in complexities[1:] for i in intervals[1:]
+    ]
+
+    rows = []
+    for c in range(len(complexities)):
+        for i in range(len(intervals)):
+            complexity_dummies = [1.0 if c == level else 0.0 for level in range(1, len(complexities))]
+            interval_dummies = [1.0 if i == level else 0.0 for level in range(1, len(intervals))]
+            interaction = [a * b for a in complexity_dummies for b in interval_dummies]
+            rows.append([1.0] + complexity_dummies + interval_dummies + interaction)
+    return columns, np.array(rows)
+
+
+# -----------------------------
+# LAPLACE FIT
+# -----------------------------
+def inverse_logit(eta):
+    return 0.5 * (1.0 + np.tanh(0.5 * eta))
+
+
+def bernoulli_log_likelihood(data: BinomialData, eta) -> float:
+    # sum over trials of log p(correct); log1p(exp(.)) written stably
+    return float((data.correct * eta - data.attempts * np.logaddexp(0.0, eta)).sum())
+
+
+def pirls(data: BinomialData, sigma: float, beta, b):
+    """Conditional modes of (beta, b) for a fixed random-intercept SD.
+
+    Newton steps on the penalized log-likelihood. The random-intercept block of the
+    Hessian is diagonal, so it is eliminated per participant and only a
+    (fixed effects × fixed effects) system is solved. Rows share one design row
+    per cell, so every X-product is a bincount over cells followed by a tiny product.
+    Returns (beta, b, weights per participant, inverse Schur complement).
+    """
+    design = data.cell_design
+    precision = 1.0 / (sigma * sigma)
+
+    def penalized(beta, b):
+        eta = data.linear_predictor(beta, b)
+        return bernoulli_log_likelihood(data, eta) - 0.5 * precision * float(b @ b)
+
+    def newton_system(beta, b):
+        mu = inverse_logit(data.linear_predictor(beta, b))
+        residual = data.correct - data.attempts * mu
+        weights = data.attempts * mu * (1.0 - mu)
+
+        cell_weights = data.grid_sums(weights)  # participants × cells
+        score_beta = design.T @ data.cell_sums(residual)
+        score_b = data.group_sums(residual) - precision * b
+        diagonal = cell_weights.sum(axis=1) + precision
+        cross = design.T @ cell_weights.T  # X'WZ
+        schur = (design.T * cell_weights.sum(axis=0)) @ design - (cross / diagonal) @ cross.T
+        return score_beta, score_b, diagonal, cross, schur
+
+    objective = penalized(beta, b)
+    for _ in range(PIRLS_MAX_ITERATIONS):
+        score_beta, score_b, diagonal, cross, schur = newton_system(beta, b)
+        step_beta = np.linalg.solve(schur, score_beta - cross @ (score_b / diagonal))
+        step_b = (score_b - cross.T @ step_beta) / diagonal
+
+        # Step halving keeps every accepted step an improvement
+        scale = 1.0
+        while True:
+            new_beta, new_b = beta + scale * step_beta, b + scale * step_b
+            new_objective = penalized(new_beta, new_b)
+            if new_objective >= objective - 1e-12 or scale < 1e-4:
+                break
+            scale /= 2
+
+        beta, b = new_beta, new_b
+        converged = abs(new_objective - objective) < PIRLS_TOLERANCE * (1 + abs(objective))
+        objective = new_objective
+        if converged and max(np.abs(step_beta).max(), np.abs(step_b).max(initial=0.0)) * scale < 1e-6:
+            break
+
+    _, _, diagonal, _, schur = newton_system(beta, b)
+    return beta, b, diagonal - precision, np.linalg.inv(schur)
+
+
+def laplace_deviance(data: BinomialData, sigma: float, beta, b, group_weights) -> float:
+    """-2 × Laplace-approximate log-likelihood at the joint PIRLS modes of (beta, b).
+
+    beta comes from PIRLS rather than from minimizing this deviance, so with sigma
+    optimized over it the fit corresponds to glmer's nAGQ = 0, not its default nAGQ = 1.
+    """
+    eta = data.linear_predictor(beta, b)
+    return (
+        -2.0 * bernoulli_log_likelihood(data, eta)
+        + float(b @ b) / (sigma * sigma)
+        + float(np.log1p(sigma * sigma * group_weights).sum())
+    )
+
+
+def fit_glmm(data: BinomialData) -> dict:
+    """Fit correct ~ complexity * interval_length + (1 | participant), logit link.
+
+    The SD of the participant intercepts is found by golden-section search on
+    log(sigma) over the Laplace deviance; every evaluation warm-starts PIRLS, which
+    estimates beta and b jointly for that sigma (glmer's nAGQ = 0).
+    """
+    state = {
+        "beta": np.zeros(data.cell_design.shape[1]),
+        "b": np.zeros(data.participants),
+    }
+    evaluations = []
+
+    def deviance(log_sigma):
+        sigma = math.exp(log_sigma)
+        beta, b, group_weights, covariance = pirls(data, sigma, state["beta"], state["b"])
+        state["beta"], state["b"] = beta, b
+        value = laplace_deviance(data, sigma, beta, b, group_weights)
+        evaluations.append((value, sigma, beta, b, covariance))
+        return value
+
+    # Golden-section search; the deviance is smooth and unimodal in log(sigma) here
+    ratio = (math.sqrt(5) - 1) / 2
+    low, high = math.log(SIGMA_BOUNDS[0]), math.log(SIGMA_BOUNDS[1])
+    left = high - ratio * (high - low)
+    right = low + ratio * (high - low)
+    left_value, right_value = deviance(left), deviance(right)
+    while high - low > SIGMA_TOLERANCE:
+        if left_value <= right_value:
+            high, right, right_value = right, left, left_value
+            left = high - ratio * (high - low)
+            left_value = deviance(left)
+        else:
+            low, left, left_value = left, right, right_value
+            right = low + ratio * (high - low)
+            right_value = deviance(right)
+
+    value, sigma, beta, b, covariance = min(evaluations, key=lambda evaluation: evaluation[0])
+    return {
+        "deviance": value,
+        "log_likelihood": -0.5 * value,
+        "sigma": sigma,
+        "beta": beta,
+        "covariance": covariance,
+        "random_intercepts": b,
+        "evaluations": len(evaluations),
+    }
+
+
+# -----------------------------
+# INFERENCE
+# -----------------------------
+def coefficient_table(data: BinomialData, fit: dict) -> list:
+    rows = []
+    standard_errors = np.sqrt(np.diag(fit["covariance"]))
+    for name, estimate, se in zip(data.columns, fit["beta"], standard_errors):
+        z = estimate / se
+        rows.append({
+            "term": name,
+            "estimate": float(estimate),
+            "se": float(se),
+            "z": float(z),
+            "p": math.erfc(abs(z) / math.sqrt(2)),
+        })
+    return rows
+
+
+def wald_tests(data: BinomialData, fit: dict) -> list:
+    """Joint Wald chi-square tests of the complexity, interval and interaction terms."""
+    tests = []
+    for effect, prefix in (
+        ("complexity", "complexity"),
+        ("interval_length", "interval_length"),
+        ("complexity:interval_length", None),
+    ):
+        if prefix is None:
+            indices = [k for k, name in enumerate(data.columns) if ":" in name]
+        else:
+            indices = [k for k, name in enumerate(data.columns) if name.startswith(prefix) and ":" not in name]
+        beta = fit["beta"][indices]
+        covariance = fit["covariance"][np.ix_(indices, indices)]
+        chi2 = float(beta @ np.linalg.solve(covariance, beta))
+        tests.append({"effect": effect, "df": len(indices), "chi2": chi2, "p": chi2_sf(chi2, len(indices))})
+    return tests
+
+
+def cell_probabilities(data: BinomialData, fit: dict) -> list:
+    """Predicted accuracy per cell for a typical participant (random intercept 0)."""
+    eta = data.cell_design @ fit["beta"]
+    se = np.sqrt(np.einsum("ij,jk,ik->i", data.cell_design, fit["covariance"], data.cell_design))
+    return [
+        {
+            "complexity": complexity,
+            "interval_length": interval_length,
+            "probability": float(inverse_logit(value)),
+            "ci_low": float(inverse_logit(value - 1.96 * error)),
+            "ci_high": float(inverse_logit(value + 1.96 * error)),
+        }
+        for (complexity, interval_length), value, error in zip(data.cell_names, eta, se)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Trial-level logistic mixed model: correct ~ complexity * interval_length + (1 | participant)."
+    )
+    parser.add_argument(
+        "input",
+        nargs="?",
+        default="session_data",
+        help="Session folder, or a participant_accuracy.csv (its tasks_completed and accuracy "
+        "give the same counts). Default: session_data",
+    )
+    parser.add_argument("--output", default=None, help="Write the coefficient table to this CSV file.")
+    parser.add_argument("--jobs", type=int, default=1, help="Worker processes for reading. Default: 1")
+    parser.add_argument(
+        "--cache",
+        default=None,
+        help="JSON file of per-file counts shared with aggregate_accuracy.py --cache.",
+    )
+    parser.add_argument("--fast", action="store_true", help="Use the memory-mapped reader.")
+    args = parser.parse_args()
+
+    input_path = Path(args.input)
+    if not input_path.exists():
+        raise FileNotFoundError(f"Input not found: {input_path}")
+    if args.jobs < 1:
+        raise ValueError("--jobs must be at least 1")
+
+    start = time.perf_counter()
+    table = load_cell_table(input_path, args.jobs, Path(args.cache) if args.cache else None, args.fast)
+    read_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    data = BinomialData(table)
+    fit = fit_glmm(data)
+    fit_seconds = time.perf_counter() - start
+
+    print(f"{data.trials} trials, {data.participants} participants, {len(data.correct)} participant cells "
+          f"(read {read_seconds:.2f} s, fit {fit_seconds:.2f} s, {fit['evaluations']} evaluations)")
+    print(f"Laplace log-likelihood {fit['log_likelihood']:.3f}, deviance {fit['deviance']:.3f}")
+    print(f"Random intercept SD (participant, logit scale): {fit['sigma']:.4f}")
+
+    print("\nFixed effects:")
+    coefficients = coefficient_table(data, fit)
+    for row in coefficients:
+        print(f"  {row['term']:36s} {row['estimate']:9.4f} {row['se']:8.4f} "
+              f"z = {row['z']:8.3f}  p = {row['p']:.3g}")
+
+    print("\nWald tests:")
+    for row in wald_tests(data, fit):
+        print(f"  {row['effect']:28s} chi2({row['df']}) = {row['chi2']:10.3f}  p = {row['p']:.3g}")
+
+    print("\nPredicted accuracy (random intercept 0, 95% CI):")
+    for row in cell_probabilities(data, fit):
+        print(f"  {row['complexity']:8s} {row['interval_length']:>4s} {row['probability']:.4f} "
+              f"[{row['ci_low']:.4f}, {row['ci_high']:.4f}]")
+
+    if args.output:
+        with open(args.output, "w", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=["term", "estimate", "se", "z", "p"])
+            writer.writeheader()
+            writer.writerows(coefficients)
+
+
+if __name__ == "__main__":
+    main()
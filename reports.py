@@ -0,0 +1,315 @@
+import argparse
+import csv
+import json
+import time
+from pathlib import Path
+
+from aggregate_accuracy import COMPLEXITY_ORDER
+from trial_features import TRIAL_TYPE_REPEAT, TRIAL_TYPE_START, TRIAL_TYPE_SWITCH, iter_trials
+
+
+# -----------------------------
+# REDUCERS
+# -----------------------------
+# Each reducer keeps one small state per group. Blank or non-numeric values are
+# skipped by every reducer except count, which counts rows.
+def parse_number(text):
+    try:
+        return int(text)
+    except ValueError:
+        try:
+            return float(text)
+        except ValueError:
+            return None
+
+
+class Count:
+    def start(self):
+        return 0
+
+    def add(self, state, value):
+        return state + 1
+
+    def result(self, state):
+        return state
+
+
+class Sum:
+    def start(self):
+        return 0
+
+    def add(self, state, value):
+        return state + value if value is not None else state
+
+    def result(self, state):
+        return state
+
+
+class Mean:
+    def start(self):
+        return (0, 0)
+
+    def add(self, state, value):
+        return (state[0] + value, state[1] + 1) if value is not None else state
+
+    def result(self, state):
+        return state[0] / state[1] if state[1] else ""
+
+
+class Min:
+    def start(self):
+        return None
+
+    def add(self, state, value):
+        if value is None or (state is not None and state <= value):
+            return state
+        return value
+
+    def result(self, state):
+        return state if state is not None else ""
+
+
+class Max:
+    def start(self):
+        return None
+
+    def add(self, state, value):
+        if value is None or (state is not None and state >= value):
+            return state
+        return value
+
+    def result(self, state):
+        return state if state is not None else ""
+
+
+REDUCERS = {
+    "count": Count(),
+    "sum": Sum(),
+    "mean": Mean(),
+    "min": Min(),
+    "max": Max(),
+}
+
+
+# -----------------------------
+# REPORTS
+# -----------------------------
+class Report:
+    """One grouped output file, filled one row at a time.
+
+    ``key`` maps a trial row (a dict of the CSV fields plus the fields added by
+    trial_features.py, such as ``participant`` and ``trial_type``) to its group; a
+    list of field names is shorthand for picking those fields. ``aggregates`` is a
+    list of (output column, reducer name, field) with reducer names from REDUCERS.
+    Groups are written sorted by ``sort_key(key)`` (default: the key itself).
+    """
+
+    def __init__(self, name, key_columns, key, aggregates, sort_key=None):
+        self.name = name
+        self.key_columns = list(key_columns)
+        if not callable(key):
+            key = field_key(list(key))
+        self.key = key
+        self.aggregates = [
+            (column, REDUCERS[reducer], field) for column, reducer, field in aggregates
+        ]
+        self.sort_key = sort_key
+        self.groups = {}
+
+    def add(self, row):
+        key = self.key(row)
+        states = self.groups.get(key)
+        if states is None:
+            states = self.groups[key] = [reducer.start() for _, reducer, _ in self.aggregates]
+
+        for index, (_, reducer, field) in enumerate(self.aggregates):
+            value = parse_number(row.get(field) or "") if field is not None else None
+            states[index] = reducer.add(states[index], value)
+
+    def rows(self):
+        for key in sorted(self.groups, key=self.sort_key):
+            states = self.groups[key]
+            yield list(key) + [
+                reducer.result(state) for (_, reducer, _), state in zip(self.aggregates, states)
+            ]
+
+    def write(self, output_file: Path) -> None:
+        with output_file.open("w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(self.key_columns + [column for column, _, _ in self.aggregates])
+            writer.writerows(self.rows())
+
+    @classmethod
+    def from_spec(cls, spec: dict) -> "Report":
+        """Build a report from {"name", "key": [fields], "aggregates": [[column, reducer, field]]}."""
+        for column, reducer, field in spec["aggregates"]:
+            if reducer not in REDUCERS:
+                raise ValueError(f"report {spec['name']}: unknown reducer {reducer!r}")
+        return cls(
+            spec["name"],
+            spec.get("columns", spec["key"]),
+            spec["key"],
+            spec["aggregates"],
+            sort_key=cell_sort_key(spec["key"]),
+        )
+
+
+def field_key(fields):
+    def key(row):
+        return tuple(row.get(field, "") for field in fields)
+    return key
+
+
+def cell_sort_key(fields):
+    # Order complexity labels Easy, Medium, Hard like aggregate_accuracy.py does
+    def sort_key(key):
+        return tuple(
+            (COMPLEXITY_ORDER.get(value, 999), value) if field == "complexity_label" else (0, value)
+            for field, value in zip(fields, key)
+        )
+    return sort_key
+
+
+def participant_accuracy_sort_key(key):
+    participant, complexity_label, interval_length = key
+    return participant, COMPLEXITY_ORDER.get(complexity_label, 999), interval_length, complexity_label
+
+
+TRIAL_TYPE_ORDER = {TRIAL_TYPE_START: 1, TRIAL_TYPE_SWITCH: 2, TRIAL_TYPE_REPEAT: 3}
+
+
+def switch_cost_sort_key(key):
+    participant, complexity_label, interval_length, trial_type = key
+    return (
+        participant_accuracy_sort_key((participant, complexity_label, interval_length)),
+        TRIAL_TYPE_ORDER.get(trial_type, 999),
+    )
+
+
+def builtin_reports() -> list:
+    """Fresh instances of the built-in reports; participant_accuracy matches aggregate_accuracy.py."""
+    return [
+        Report(
+            "participant_accuracy",
+            ["participant", "complexity", "interval_length"],
+            lambda row: (row["participant"], row["complexity_label"], row["interval_length"]),
+            [("tasks_completed", "count", None), ("accuracy", "mean", "correct")],
+            sort_key=participant_accuracy_sort_key,
+        ),
+        Report.from_spec({
+            "name": "accuracy_by_task_type",
+            "key": ["participant", "complexity_label", "interval_length", "task_type"],
+            "columns": ["participant", "complexity", "interval_length", "task_type"],
+            "aggregates": [["tasks_completed", "count", None], ["accuracy", "mean", "correct"]],
+        }),
+        Report(
+            "switch_cost",
+            ["participant", "complexity", "interval_length", "trial_type"],
+            ["participant", "complexity_label", "interval_length", "trial_type"],
+            [
+                ("tasks_completed", "count", None),
+                ("accuracy", "mean", "correct"),
+                ("mean_response_time_ms", "mean", "response_time_ms"),
+            ],
+            sort_key=switch_cost_sort_key,
+        ),
+        Report.from_spec({
+            "name": "participant_summary",
+            "key": ["participant"],
+            "aggregates": [
+                ["tasks_completed", "count", None],
+                ["correct", "sum", "correct"],
+                ["accuracy", "mean", "correct"],
+                ["mean_response_time_ms", "mean", "response_time_ms"],
+                ["min_response_time_ms", "min", "response_time_ms"],
+                ["max_response_time_ms", "max", "response_time_ms"],
+            ],
+        }),
+        Report.from_spec({
+            "name": "condition_summary",
+            "key": ["complexity_label", "interval_length", "task_type"],
+            "columns": ["complexity", "interval_length", "task_type"],
+            "aggregates": [
+                ["tasks_completed", "count", None],
+                ["accuracy", "mean", "correct"],
+                ["mean_response_time_ms", "mean", "response_time_ms"],
+            ],
+        }),
+    ]
+
+
+# -----------------------------
+# ONE-PASS SCAN
+# -----------------------------
+def run_reports(input_folder: Path, reports: list) -> int:
+    """Feed every trial row of the folder to every report in one pass; returns the row count."""
+    rows = 0
+    for row in iter_trials(input_folder):
+        for report in reports:
+            report.add(row)
+        rows += 1
+    return rows
+
+
+def load_report_specs(spec_file: Path) -> list:
+    with spec_file.open() as file:
+        return [Report.from_spec(spec) for spec in json.load(file)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Write several grouped reports from one pass over the session files."
+    )
+    parser.add_argument(
+        "input_folder",
+        nargs="?",
+        default="session_data",
+        help="Folder containing participant CSV files. Default: session_data",
+    )
+    parser.add_argument(
+        "output_folder",
+        nargs="?",
+        default="reports",
+        help="Folder for the report CSV files (one per report). Default: reports",
+    )
+    parser.add_argument(
+        "--spec",
+        default=None,
+        help='JSON list of extra reports: [{"name", "key": [fields], "aggregates": [[column, reducer, field]]}]',
+    )
+    parser.add_argument(
+        "--only",
+        nargs="+",
+        default=None,
+        help="Names of the reports to write. Default: all",
+    )
+    args = parser.parse_args()
+
+    input_folder = Path(args.input_folder)
+    output_folder = Path(args.output_folder)
+
+    if not input_folder.exists() or not input_folder.is_dir():
+        raise FileNotFoundError(f"Input folder not found: {input_folder}")
+
+    reports = builtin_reports()
+    if args.spec:
+        reports += load_report_specs(Path(args.spec))
+    if args.only:
+        unknown = set(args.only) - {report.name for report in reports}
+        if unknown:
+            raise ValueError(f"Unknown reports: {', '.join(sorted(unknown))}")
+        reports = [report for report in reports if report.name in args.only]
+
+    start = time.perf_counter()
+    rows = run_reports(input_folder, reports)
+
+    output_folder.mkdir(parents=True, exist_ok=True)
+    for report in reports:
+        report.write(output_folder / f"{report.name}.csv")
+    elapsed = time.perf_counter() - start
+
+    print(f"{len(reports)} reports from {rows} trials in one pass ({elapsed:.2f} s)")
+
+
+if __name__ == "__main__":
+    main()
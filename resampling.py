@@ -0,0 +1,358 @@
+import argparse
+import csv
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from aggregate_accuracy import COMPLEXITY_ORDER, AccuracyAccumulator, build_accumulator
+
+
+DEFAULT_RESAMPLES = 10000
+DEFAULT_SEED = 237
+CHUNK_RESAMPLES = 500      # resamples per task; fixed so --jobs never changes the result
+BATCH_ELEMENTS = 4000000   # resample-matrix entries held in memory at a time
+
+
+# -----------------------------
+# CELL TABLE
+# -----------------------------
+class CellTable:
+    """Participant accuracy for the complexity × interval_length design as NumPy arrays.
+
+    ``accuracy`` and ``attempts`` have shape (participants, complexities, intervals),
+    with levels in ``complexities`` (Easy, Medium, Hard) and ``intervals`` order. A cell
+    a participant never attempted has accuracy NaN and 0 attempts.
+    """
+
+    def __init__(self, complexities: list, intervals: list, accuracy, attempts):
+        self.complexities = list(complexities)
+        self.intervals = list(intervals)
+        self.accuracy = accuracy
+        self.attempts = attempts
+
+    @property
+    def participants(self) -> int:
+        return self.accuracy.shape[0]
+
+    @classmethod
+    def from_cells(cls, cells: dict, participants: int) -> "CellTable":
+        """Build from {(participant, complexity_label, interval_length): (attempts, accuracy)}."""
+        complexities = sorted(
+            {cell[1] for cell in cells},
+            key=lambda label: (COMPLEXITY_ORDER.get(label, 999), label),
+        )
+        intervals = sorted({cell[2] for cell in cells}, key=lambda value: (float(value), value))
+        complexity_index = {label: index for index, label in enumerate(complexities)}
+        interval_index = {value: index for index, value in enumerate(intervals)}
+
+        shape = (participants, len(complexities), len(intervals))
+        accuracy = np.full(shape, np.nan)
+        attempts = np.zeros(shape, dtype=np.int64)
+        for (participant, complexity, interval_length), (count, value) in cells.items():
+            index = (participant - 1, complexity_index[complexity], interval_index[interval_length])
+            attempts[index] = count
+            accuracy[index] = value
+        return cls(complexities, intervals, accuracy, attempts)
+
+    @classmethod
+    def from_accumulator(cls, accumulator: AccuracyAccumulator) -> "CellTable":
+        cells = {
+            (participant, complexity, interval_length): (attempts, correct / attempts)
+            for participant, complexity, interval_length, attempts, correct in accumulator.rows()
+        }
+        return cls.from_cells(cells, accumulator.participants)
+
+    @classmethod
+    def from_csv(cls, csv_path: Path) -> "CellTable":
+        """Read a participant_accuracy.csv written by aggregate_accuracy.py."""
+        cells = {}
+        participant_numbers = {}
+        with csv_path.open("r", newline="") as file:
+            for row in csv.DictReader(file):
+                participant = participant_numbers.setdefault(
+                    row["participant"], len(participant_numbers) + 1
+                )
+                cells[(participant, row["complexity"], row["interval_length"])] = (
+                    int(row["tasks_completed"]),
+                    float(row["accuracy"]),
+                )
+        return cls.from_cells(cells, len(participant_numbers))
+
+    def complete(self) -> "CellTable":
+        """Only the participants with every cell attempted (needed by within-subject tests)."""
+        keep = (self.attempts > 0).all(axis=(1, 2))
+        return CellTable(self.complexities, self.intervals, self.accuracy[keep], self.attempts[keep])
+
+
+def load_cell_table(path: Path, jobs: int = 1, cache_file: Path = None, fast: bool = False) -> CellTable:
+    """A participant_accuracy.csv file, or a session folder aggregated in this process."""
+    if path.is_dir():
+        return CellTable.from_accumulator(build_accumulator(path, jobs, cache_file, fast))
+    return CellTable.from_csv(path)
+
+
+# -----------------------------
+# CLUSTER BOOTSTRAP
+# -----------------------------
+def effect_statistics(cell_means):
+    """Cell means, both sets of marginal means and their pairwise differences.
+
+    ``cell_means`` has shape (..., complexities, intervals); returns a dict of arrays
+    of shape (...).
+    """
+    complexities, intervals = cell_means.shape[-2:]
+    by_complexity = cell_means.mean(axis=-1)
+    by_interval = cell_means.mean(axis=-2)
+
+    statistics = {}
+    for c in range(complexities):
+        for i in range(intervals):
+            statistics[("cell", c, i)] = cell_means[..., c, i]
+    for c in range(complexities):
+        statistics[("complexity", c)] = by_complexity[..., c]
+    for i in range(intervals):
+        statistics[("interval", i)] = by_interval[..., i]
+    for a in range(complexities):
+        for b in range(a + 1, complexities):
+            statistics[("complexity_diff", a, b)] = by_complexity[..., a] - by_complexity[..., b]
+    for a in range(intervals):
+        for b in range(a + 1, intervals):
+            statistics[("interval_diff", a, b)] = by_interval[..., a] - by_interval[..., b]
+    return statistics
+
+
+def cell_means(weights, values, present):
+    # weights: (resamples, participants) draw counts; values/present: (participants, cells)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (weights @ values) / (weights @ present)
+
+
+def bootstrap_chunk(values, present, resamples: int, seed_sequence):
+    """Cell means for ``resamples`` participant-level bootstrap samples.
+
+    Each sample draws participants with replacement; the draws are turned into
+    per-participant counts with one bincount, so a batch of samples is a single
+    (batch × participants) @ (participants × cells) product.
+    """
+    rng = np.random.default_rng(seed_sequence)
+    participants = values.shape[0]
+    batch = max(1, min(resamples, BATCH_ELEMENTS // max(participants, 1)))
+
+    results = []
+    for start in range(0, resamples, batch):
+        size = min(batch, resamples - start)
+        draws = rng.integers(0, participants, size=(size, participants))
+        draws += np.arange(size)[:, None] * participants
+        weights = np.bincount(draws.ravel(), minlength=size * participants)
+        weights = weights.reshape(size, participants).astype(np.float64)
+        results.append(cell_means(weights, values, present))
+    return np.concatenate(results)
+
+
+def run_chunks(function, arrays: tuple, resamples: int, seed: int, jobs: int):
+    # Chunk sizes and seeds depend only on resamples and seed, never on jobs
+    sizes = [min(CHUNK_RESAMPLES, resamples - start) for start in range(0, resamples, CHUNK_RESAMPLES)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    if jobs > 1 and len(sizes) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [executor.submit(function, *arrays, size, child) for size, child in zip(sizes, seeds)]
+            return np.concatenate([future.result() for future in futures])
+
+    return np.concatenate([function(*arrays, size, child) for size, child in zip(sizes, seeds)])
+
+
+def cluster_bootstrap(
+    table: CellTable,
+    resamples: int = DEFAULT_RESAMPLES,
+    confidence: float = 0.95,
+    seed: int = DEFAULT_SEED,
+    jobs: int = 1,
+) -> list:
+    """Percentile CIs from resampling whole participants.
+
+    Returns (statistic key, estimate, low, high) for every key of effect_statistics().
+    A cell mean averages the participants who attempted that cell.
+    """
+    shape = table.accuracy.shape[1:]
+    present = (table.attempts > 0).reshape(table.participants, -1).astype(np.float64)
+    values = np.nan_to_num(table.accuracy).reshape(table.participants, -1)
+
+    observed = cell_means(np.ones((1, table.participants)), values, present).reshape(shape)
+    samples = run_chunks(bootstrap_chunk, (values, present), resamples, seed, jobs)
+    samples = samples.reshape((resamples,) + shape)
+
+    alpha = 1 - confidence
+    estimates = effect_statistics(observed)
+    results = []
+    for key, values in effect_statistics(samples).items():
+        low, high = np.nanquantile(values, [alpha / 2, 1 - alpha / 2])
+        results.append((key, float(estimates[key]), float(low), float(high)))
+    return results
+
+
+# -----------------------------
+# WITHIN-SUBJECT PERMUTATION TESTS
+# -----------------------------
+def level_permutations(levels: int):
+    """Every ordering of range(levels), as an array of shape (levels!, levels)."""
+    orders = [[]]
+    for _ in range(levels):
+        orders = [order + [level] for order in orders for level in range(levels) if level not in order]
+    return np.array(orders)
+
+
+def permutation_chunk(columns, orderings: int, resamples: int, seed_sequence):
+    """Effect sizes for ``resamples`` random relabellings.
+
+    ``columns[k]`` holds, for every stratum and every ordering of the tested levels,
+    the centered value that lands on level k (strata × orderings, flattened). A
+    resample picks one ordering per stratum and sums the picked values per level;
+    the last level is minus the sum of the others, since each stratum is centered.
+    """
+    rng = np.random.default_rng(seed_sequence)
+    strata = columns.shape[1] // orderings
+    offsets = np.arange(strata, dtype=np.int32) * orderings
+    batch = max(1, min(resamples, BATCH_ELEMENTS // max(strata, 1)))
+
+    results = []
+    for start in range(0, resamples, batch):
+        size = min(batch, resamples - start)
+        picks = rng.integers(0, orderings, size=(size, strata), dtype=np.int32)
+        picks += offsets
+        level_sums = [np.take(column, picks).sum(axis=1) for column in columns]
+        effect = sum(level_sum ** 2 for level_sum in level_sums) + sum(level_sums) ** 2
+        results.append(effect)
+    return np.concatenate(results)
+
+
+def permutation_test(
+    table: CellTable,
+    factor: str,
+    resamples: int = DEFAULT_RESAMPLES,
+    seed: int = DEFAULT_SEED,
+    jobs: int = 1,
+) -> tuple:
+    """Within-subject permutation test of the ``factor`` main effect.
+
+    ``factor`` is "complexity" or "interval". Levels of the factor are shuffled
+    within each participant at each level of the other factor. Uses participants
+    with every cell attempted. Returns (observed effect size, p-value, participants),
+    where the effect size is the sum of squared deviations of the level means.
+    """
+    table = table.complete()
+    accuracy = table.accuracy
+    if factor == "interval":
+        accuracy = accuracy.swapaxes(1, 2)
+    elif factor != "complexity":
+        raise ValueError(f"Unknown factor: {factor}")
+
+    # strata = participant × other-factor level; rows hold the tested factor's levels.
+    # Centering each stratum leaves the level differences, which is all the test uses.
+    strata = accuracy.swapaxes(1, 2).reshape(-1, accuracy.shape[1])
+    strata = strata - strata.mean(axis=1, keepdims=True)
+    orders = level_permutations(strata.shape[1])
+    permuted = strata[:, orders]
+    columns = np.ascontiguousarray(permuted[:, :, :-1].transpose(2, 0, 1)).reshape(strata.shape[1] - 1, -1)
+
+    observed = (strata.sum(axis=0) ** 2).sum()
+    samples = run_chunks(permutation_chunk, (columns, len(orders)), resamples, seed, jobs)
+
+    # Ties within rounding count as at least as extreme
+    p_value = (1 + np.count_nonzero(samples >= observed * (1 - 1e-9))) / (1 + resamples)
+    return float(observed / strata.shape[0] ** 2), float(p_value), table.participants
+
+
+# -----------------------------
+# OUTPUT
+# -----------------------------
+def statistic_name(table: CellTable, key: tuple) -> str:
+    kind, *levels = key
+    if kind == "cell":
+        return f"cell {table.complexities[levels[0]]} {table.intervals[levels[1]]}"
+    if kind == "complexity":
+        return f"complexity {table.complexities[levels[0]]}"
+    if kind == "interval":
+        return f"interval {table.intervals[levels[0]]}"
+    if kind == "complexity_diff":
+        return f"complexity {table.complexities[levels[0]]} - {table.complexities[levels[1]]}"
+    return f"interval {table.intervals[levels[0]]} - {table.intervals[levels[1]]}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Cluster bootstrap CIs and within-subject permutation tests for the accuracy cells."
+    )
+    parser.add_argument(
+        "input",
+        nargs="?",
+        default="participant_accuracy.csv",
+        help="participant_accuracy.csv, or a session folder to aggregate first. "
+        "Default: participant_accuracy.csv",
+    )
+    parser.add_argument(
+        "--output",
+        default=None,
+        help="Also write the bootstrap intervals to this CSV file.",
+    )
+    parser.add_argument(
+        "--resamples",
+        type=int,
+        default=DEFAULT_RESAMPLES,
+        help=f"Bootstrap samples and permutations. Default: {DEFAULT_RESAMPLES}",
+    )
+    parser.add_argument("--confidence", type=float, default=0.95, help="CI level. Default: 0.95")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help=f"Random seed. Default: {DEFAULT_SEED}")
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Worker processes for reading a session folder and for the resampling. Default: 1",
+    )
+    parser.add_argument(
+        "--cache",
+        default=None,
+        help="JSON file of per-file counts, as in aggregate_accuracy.py.",
+    )
+    parser.add_argument("--fast", action="store_true", help="Use the memory-mapped reader.")
+    args = parser.parse_args()
+
+    input_path = Path(args.input)
+    if not input_path.exists():
+        raise FileNotFoundError(f"Input not found: {input_path}")
+    if args.jobs < 1:
+        raise ValueError("--jobs must be at least 1")
+    if args.resamples < 1:
+        raise ValueError("--resamples must be at least 1")
+
+    start = time.perf_counter()
+    table = load_cell_table(input_path, args.jobs, Path(args.cache) if args.cache else None, args.fast)
+    intervals = cluster_bootstrap(table, args.resamples, args.confidence, args.seed, args.jobs)
+    tests = [
+        (factor, *permutation_test(table, factor, args.resamples, args.seed, args.jobs))
+        for factor in ("complexity", "interval")
+    ]
+    elapsed = time.perf_counter() - start
+
+    print(f"Cluster bootstrap, {table.participants} participants, {args.resamples} resamples, "
+          f"{args.confidence:.0%} percentile CIs:")
+    rows = [(statistic_name(table, key), estimate, low, high) for key, estimate, low, high in intervals]
+    for name, estimate, low, high in rows:
+        print(f"  {name:28s} {estimate:8.4f}  [{low:8.4f}, {high:8.4f}]")
+
+    print(f"Within-subject permutation tests, {args.resamples} permutations:")
+    for factor, effect, p_value, participants in tests:
+        print(f"  {factor:12s} effect {effect:.6f}  p = {p_value:.4g}  ({participants} complete participants)")
+    print(f"({elapsed:.2f} s)")
+
+    if args.output:
+        with open(args.output, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["statistic", "estimate", "ci_low", "ci_high"])
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    main()
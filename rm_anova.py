@@ -0,0 +1,377 @@
+import argparse
+import csv
+import math
+import time
+from pathlib import Path
+
+import numpy as np
+
+from aggregate_accuracy import accumulator_accuracy_rows, build_accumulator, write_accuracy_rows
+from resampling import CellTable
+
+
+MEASURES = ["accuracy", "tasks_completed"]
+ADJUSTMENTS = ["holm", "bonferroni", "none"]
+
+
+# -----------------------------
+# DISTRIBUTIONS
+# -----------------------------
+# Tail probabilities from the regularized incomplete beta and gamma functions
+# (continued fractions as in Numerical Recipes), so no SciPy is needed.
+def continued_fraction(a, b, x):
+    tiny = 1e-300
+    qab, qap, qam = a + b, a + 1.0, a - 1.0
+    c = 1.0
+    d = 1.0 - qab * x / qap
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    h = d
+    for m in range(1, 500):
+        m2 = 2 * m
+        for numerator in (m * (b - m) * x / ((qam + m2) * (a + m2)),
+                          -(a + m) * (qab + m) * x / ((a + m2) * (qap + m2))):
+            d = 1.0 + numerator * d
+            d = 1.0 / (d if abs(d) > tiny else tiny)
+            c = 1.0 + numerator / c
+            c = c if abs(c) > tiny else tiny
+            h *= d * c
+        if abs(d * c - 1.0) < 1e-15:
+            break
+    return h
+
+
+def beta_inc(a, b, x):
+    """Regularized incomplete beta function I_x(a, b)."""
+    if x <= 0.0:
+        return 0.0
+    if x >= 1.0:
+        return 1.0
+    front = math.exp(
+        math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log1p(-x)
+    )
+    if x < (a + 1.0) / (a + b + 2.0):
+        return front * continued_fraction(a, b, x) / a
+    return 1.0 - front * continued_fraction(b, a, 1.0 - x) / b
+
+
+def gamma_inc_upper(a, x):
+    """Regularized upper incomplete gamma function Q(a, x)."""
+    if x <= 0.0:
+        return 1.0
+    if x < a + 1.0:
+        term = total = 1.0 / a
+        for n in range(1, 1000):
+            term *= x / (a + n)
+            total += term
+            if abs(term) < abs(total) * 1e-15:
+                break
+        return 1.0 - total * math.exp(-x + a * math.log(x) - math.lgamma(a))
+
+    tiny = 1e-300
+    b = x + 1.0 - a
+    c = 1.0 / tiny
+    d = 1.0 / b
+    h = d
+    for n in range(1, 1000):
+        an = -n * (n - a)
+        b += 2.0
+        d = an * d + b
+        d = 1.0 / (d if abs(d) > tiny else tiny)
+        c = b + an / c
+        c = c if abs(c) > tiny else tiny
+        h *= d * c
+        if abs(d * c - 1.0) < 1e-15:
+            break
+    return math.exp(-x + a * math.log(x) - math.lgamma(a)) * h
+
+
+def f_sf(f, df1, df2):
+    if not f > 0.0:
+        return 1.0
+    return beta_inc(df2 / 2.0, df1 / 2.0, df2 / (df2 + df1 * f))
+
+
+def chi2_sf(x, df):
+    return gamma_inc_upper(df / 2.0, x / 2.0)
+
+
+def t_two_sided(t, df):
+    return beta_inc(df / 2.0, 0.5, df / (df + t * t))
+
+
+def t_quantile(probability, df):
+    """Upper ``probability`` point of the t distribution, by bisection."""
+    low, high = 0.0, 1.0
+    while t_two_sided(high, df) / 2 > probability:
+        high *= 2
+    for _ in range(100):
+        middle = (low + high) / 2
+        if t_two_sided(middle, df) / 2 > probability:
+            low = middle
+        else:
+            high = middle
+    return (low + high) / 2
+
+
+# -----------------------------
+# REPEATED-MEASURES ANOVA
+# -----------------------------
+def orthonormal_contrasts(levels: int):
+    """Normalized Helmert contrasts: (levels, levels - 1), columns orthonormal and sum to zero."""
+    contrasts = np.zeros((levels, levels - 1))
+    for column in range(levels - 1):
+        contrasts[:column + 1, column] = 1.0
+        contrasts[column + 1, column] = -(column + 1)
+        contrasts[:, column] /= math.sqrt((column + 1) * (column + 2))
+    return contrasts
+
+
+def within_effect(name: str, scores, weight: float) -> dict:
+    """F test, sphericity checks and corrections for one within-subject effect.
+
+    ``scores`` holds each participant's orthonormal contrast scores, shape
+    (participants, df); ``weight`` is the number of cells averaged into each score.
+    """
+    participants, df = scores.shape
+    mean = scores.mean(axis=0)
+    centered = scores - mean
+    ss_effect = weight * participants * float(mean @ mean)
+    ss_error = weight * float((centered ** 2).sum())
+    df_error = df * (participants - 1)
+    f_value = (ss_effect / df) / (ss_error / df_error) if ss_error > 0 else math.inf
+
+    result = {
+        "effect": name,
+        "df_effect": df,
+        "df_error": df_error,
+        "ss_effect": ss_effect,
+        "ss_error": ss_error,
+        "f": f_value,
+        "p": f_sf(f_value, df, df_error),
+        "partial_eta_sq": ss_effect / (ss_effect + ss_error) if ss_effect + ss_error > 0 else math.nan,
+        "mauchly_w": math.nan,
+        "mauchly_p": math.nan,
+        "epsilon_gg": 1.0,
+        "epsilon_hf": 1.0,
+    }
+
+    if df > 1:
+        covariance = centered.T @ centered / (participants - 1)
+        trace = np.trace(covariance)
+        epsilon_gg = trace ** 2 / (df * np.trace(covariance @ covariance))
+        epsilon_hf = (participants * df * epsilon_gg - 2) / (df * (participants - 1 - df * epsilon_gg))
+        result["epsilon_gg"] = float(epsilon_gg)
+        result["epsilon_hf"] = float(min(1.0, epsilon_hf))
+
+        # Mauchly's test of sphericity on the orthonormal scores
+        w = float(np.linalg.det(covariance) / (trace / df) ** df)
+        if participants > df + 1 and w > 0:
+            factor = (participants - 1) - (2 * df * df + df + 2) / (6 * df)
+            result["mauchly_w"] = w
+            result["mauchly_p"] = chi2_sf(-factor * math.log(w), df * (df + 1) / 2 - 1)
+
+    result["p_gg"] = f_sf(f_value, df * result["epsilon_gg"], df_error * result["epsilon_gg"])
+    result["p_hf"] = f_sf(f_value, df * result["epsilon_hf"], df_error * result["epsilon_hf"])
+    return result
+
+
+def rm_anova(values) -> list:
+    """Two-way within-subject ANOVA on ``values`` of shape (participants, complexities, intervals).
+
+    Each effect is tested against its own effect × participant error term.
+    """
+    participants, complexities, intervals = values.shape
+    complexity_contrasts = orthonormal_contrasts(complexities)
+    interval_contrasts = orthonormal_contrasts(intervals)
+
+    complexity_scores = values.mean(axis=2) @ complexity_contrasts
+    interval_scores = values.mean(axis=1) @ interval_contrasts
+    interaction_scores = values.reshape(participants, -1) @ np.kron(complexity_contrasts, interval_contrasts)
+
+    return [
+        within_effect("complexity", complexity_scores, intervals),
+        within_effect("interval_length", interval_scores, complexities),
+        within_effect("complexity:interval_length", interaction_scores, 1),
+    ]
+
+
+# -----------------------------
+# PAIRWISE CONTRASTS
+# -----------------------------
+def adjust_p_values(p_values: list, method: str) -> list:
+    count = len(p_values)
+    if method == "none":
+        return list(p_values)
+    if method == "bonferroni":
+        return [min(1.0, p * count) for p in p_values]
+
+    # Holm step-down, kept monotone
+    order = sorted(range(count), key=lambda index: p_values[index])
+    adjusted = [0.0] * count
+    running = 0.0
+    for rank, index in enumerate(order):
+        running = max(running, min(1.0, (count - rank) * p_values[index]))
+        adjusted[index] = running
+    return adjusted
+
+
+def pairwise_contrasts(level_means, levels: list, factor: str, adjust: str, confidence: float) -> list:
+    """Paired comparisons of the marginal means, like pairs(emmeans(...)).
+
+    ``level_means`` is (participants, levels): each participant's mean over the other
+    factor. Each difference is tested with a paired t test on n - 1 df.
+    """
+    participants = level_means.shape[0]
+    df = participants - 1
+    critical = t_quantile((1 - confidence) / 2, df)
+
+    contrasts = []
+    for a in range(len(levels)):
+        for b in range(a + 1, len(levels)):
+            differences = level_means[:, a] - level_means[:, b]
+            estimate = float(differences.mean())
+            se = float(differences.std(ddof=1) / math.sqrt(participants))
+            t_value = estimate / se if se > 0 else math.inf
+            contrasts.append({
+                "factor": factor,
+                "contrast": f"{levels[a]} - {levels[b]}",
+                "estimate": estimate,
+                "se": se,
+                "df": df,
+                "t": t_value,
+                "p": t_two_sided(t_value, df) if se > 0 else 0.0,
+                "ci_low": estimate - critical * se,
+                "ci_high": estimate + critical * se,
+            })
+
+    for contrast, p_adjusted in zip(contrasts, adjust_p_values([c["p"] for c in contrasts], adjust)):
+        contrast["p_adjusted"] = p_adjusted
+    return contrasts
+
+
+def measure_values(table: CellTable, measure: str):
+    if measure == "accuracy":
+        return table.accuracy
+    return table.attempts.astype(np.float64)
+
+
+def anova_report(table: CellTable, measures: list, adjust: str = "holm", confidence: float = 0.95) -> dict:
+    """ANOVA and pairwise contrasts per measure, on the participants with every cell."""
+    table = table.complete()
+    report = {}
+    for measure in measures:
+        values = measure_values(table, measure)
+        report[measure] = {
+            "anova": rm_anova(values),
+            "contrasts": (
+                pairwise_contrasts(values.mean(axis=2), table.complexities, "complexity", adjust, confidence)
+                + pairwise_contrasts(values.mean(axis=1), table.intervals, "interval_length", adjust, confidence)
+            ),
+        }
+    return report
+
+
+ANOVA_COLUMNS = [
+    "measure", "effect", "df_effect", "df_error", "ss_effect", "ss_error", "f", "p",
+    "epsilon_gg", "p_gg", "epsilon_hf", "p_hf", "mauchly_w", "mauchly_p", "partial_eta_sq",
+]
+CONTRAST_COLUMNS = [
+    "measure", "factor", "contrast", "estimate", "se", "df", "t", "p", "p_adjusted", "ci_low", "ci_high",
+]
+
+
+def write_table(output_file: Path, columns: list, rows: list) -> None:
+    with output_file.open("w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Repeated-measures ANOVA (complexity x interval_length) straight from the session files."
+    )
+    parser.add_argument(
+        "input",
+        nargs="?",
+        default="session_data",
+        help="Session folder (aggregated in this process) or a participant_accuracy.csv. "
+        "Default: session_data",
+    )
+    parser.add_argument(
+        "--measures",
+        nargs="+",
+        choices=MEASURES,
+        default=MEASURES,
+        help="Dependent variables. Default: accuracy tasks_completed",
+    )
+    parser.add_argument(
+        "--adjust",
+        choices=ADJUSTMENTS,
+        default="holm",
+        help="p-value adjustment for the pairwise contrasts. Default: holm",
+    )
+    parser.add_argument("--confidence", type=float, default=0.95, help="Contrast CI level. Default: 0.95")
+    parser.add_argument(
+        "--accuracy-output",
+        default=None,
+        help="Also write participant_accuracy.csv from the same pass (session folder input only).",
+    )
+    parser.add_argument("--anova-output", default=None, help="Write the ANOVA table to this CSV file.")
+    parser.add_argument("--contrasts-output", default=None, help="Write the contrasts to this CSV file.")
+    parser.add_argument("--jobs", type=int, default=1, help="Worker processes for reading. Default: 1")
+    parser.add_argument(
+        "--cache",
+        default=None,
+        help="JSON file of per-file counts, as in aggregate_accuracy.py.",
+    )
+    parser.add_argument("--fast", action="store_true", help="Use the memory-mapped reader.")
+    args = parser.parse_args()
+
+    input_path = Path(args.input)
+    if not input_path.exists():
+        raise FileNotFoundError(f"Input not found: {input_path}")
+    if args.jobs < 1:
+        raise ValueError("--jobs must be at least 1")
+
+    start = time.perf_counter()
+    if input_path.is_dir():
+        cache_file = Path(args.cache) if args.cache else None
+        accumulator = build_accumulator(input_path, args.jobs, cache_file, args.fast)
+        if args.accuracy_output:
+            write_accuracy_rows(accumulator_accuracy_rows(accumulator), Path(args.accuracy_output))
+        table = CellTable.from_accumulator(accumulator)
+    else:
+        if args.accuracy_output:
+            raise ValueError("--accuracy-output needs a session folder as input")
+        table = CellTable.from_csv(input_path)
+
+    report = anova_report(table, args.measures, args.adjust, args.confidence)
+    elapsed = time.perf_counter() - start
+
+    complete = table.complete().participants
+    print(f"{complete} of {table.participants} participants have every cell ({elapsed:.2f} s)")
+    for measure, results in report.items():
+        print(f"\n{measure}")
+        print(f"  {'effect':28s} {'df':>11s} {'F':>10s} {'p':>10s} {'p[GG]':>10s} {'p[HF]':>10s} "
+              f"{'eps GG':>7s} {'Mauchly p':>10s} {'eta2p':>7s}")
+        for row in results["anova"]:
+            print(f"  {row['effect']:28s} {row['df_effect']:>3d}, {row['df_error']:>6d} {row['f']:10.4f} "
+                  f"{row['p']:10.3g} {row['p_gg']:10.3g} {row['p_hf']:10.3g} {row['epsilon_gg']:7.4f} "
+                  f"{row['mauchly_p']:10.3g} {row['partial_eta_sq']:7.4f}")
+        print(f"  pairwise contrasts ({args.adjust} adjusted, {args.confidence:.0%} CI):")
+        for row in results["contrasts"]:
+            print(f"  {row['factor']:16s} {row['contrast']:15s} {row['estimate']:10.4f} "
+                  f"[{row['ci_low']:9.4f}, {row['ci_high']:9.4f}]  t({row['df']}) = {row['t']:8.3f}  "
+                  f"p = {row['p_adjusted']:.3g}")
+
+    if args.anova_output:
+        rows = [dict(row, measure=measure) for measure, results in report.items() for row in results["anova"]]
+        write_table(Path(args.anova_output), ANOVA_COLUMNS, rows)
+    if args.contrasts_output:
+        rows = [dict(row, measure=measure) for measure, results in report.items() for row in results["contrasts"]]
+        write_table(Path(args.contrasts_output), CONTRAST_COLUMNS, rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,736 @@
+import argparse
+import math
+import os
+import random
+import time
+from collections import deque
+from itertools import islice
+
+import numpy as np
+
+
+# -----------------------------
+# STATES
+# -----------------------------
+STATE_START = 0
+STATE_COUNTDOWN = 1
+STATE_RUNNING = 2
+STATE_BREAK = 3
+STATE_DONE = 4
+STATE_TUTORIAL = 5
+STATE_TUTORIAL_DONE = 6
+
+# -----------------------------
+# EXPERIMENT DESIGN (3x3)
+# -----------------------------
+COMPLEXITIES = [1, 2, 3]
+INTERVALS = [10, 20, 30]
+
+TOTAL_TRIAL_TIME = 120  # seconds per block
+BREAK_DURATION = 10
+COUNTDOWN_DURATION = 5
+SWITCH_BANNER_DURATION = 1.0
+TUTORIAL_COMPLEXITY = 2
+
+# Columns of the trial rows passed to on_trial (the header of a session CSV)
+TRIAL_COLUMNS = [
+    "trial",
+    "complexity",
+    "interval_length",
+    "task_type",
+    "actual_count",
+    "user_answer",
+    "correct",
+    "stimulus_onset_ns",
+    "response_ns",
+    "response_time_ms",
+    "time_since_switch_ms",
+    "switch_trial",
+]
+
+DIGITS = "0123456789"
+TRIAL_BATCH_SIZE = 64  # stimuli generated at a time for each block and task type
+PREFETCH_COUNT = 8  # upcoming stimuli exposed by prefetch_next_block()
+
+# Random streams derived from the session seed (see SessionEngine.stream())
+STREAM_CONDITIONS = 0
+STREAM_TUTORIAL = 1
+STREAM_FIRST_BLOCK = 2  # block n uses STREAM_FIRST_BLOCK + n
+
+# -----------------------------
+# INPUTS
+# -----------------------------
+# SessionEngine.step() takes a list of these, or single characters for typed keys
+INPUT_START = "start"          # START button clicked
+INPUT_TUTORIAL = "tutorial"    # TUTORIAL button clicked
+INPUT_QUIT = "quit"            # window closed
+INPUT_ENTER = "enter"
+INPUT_BACKSPACE = "backspace"
+INPUT_SPACE = "space"
+
+
+def make_conditions(rng):
+    # Randomize the ORDER of complexity blocks
+    complexity_order = COMPLEXITIES.copy()
+    rng.shuffle(complexity_order)
+
+    conditions = []
+
+    # Randomize complexity for each level (i.e., 2 can be first) but complexity is constant for consecutive trials 1-3, 3-6, 7,-9
+    for c in complexity_order:
+        shuffled_intervals = INTERVALS.copy()
+        rng.shuffle(shuffled_intervals)
+
+        for i in shuffled_intervals:
+            conditions.append((c, i))
+
+    return conditions
+
+
+def generate_trial(rng, complexity, task_type, length=10):
+    while True:
+        digit_string = "".join(str(rng.randint(0, 9)) for _ in range(length))
+        target_digits = rng.sample(range(10), complexity)
+
+        # Ensure the answer is never 10:
+        # For task 2 (non-target count), ensure at least 1 target digit appears so the
+        # answer is at most 9. Task 1 has no restriction (0 is valid, 10 is impossibly rare).
+        target_count = sum(digit_string.count(str(d)) for d in target_digits)
+        if task_type == 1 or target_count > 0:
+            return digit_string, target_digits
+
+
+def generate_trial_batch(rng, complexity, count, task_type=1, length=10):
+    """Pre-generate ``count`` stimuli as (digit_string, target_digits, task 1 answer, task 2 answer).
+
+    ``rng`` is a NumPy Generator. Digits, target sets and both answers are computed for
+    the whole batch with array operations, so nothing has to be counted when the
+    participant presses ENTER. For task 2, stimuli without a target digit are
+    rejected on the arrays as well, which gives the same distribution as
+    generate_trial().
+    """
+    batch = []
+    # Task 2 draws enough extra rows that one pass almost always fills the batch
+    accept = 1 - (1 - complexity / 10) ** length if task_type == 2 else 1
+
+    while len(batch) < count:
+        needed = count - len(batch)
+        size = math.ceil(needed / accept * 1.1) + 4 if task_type == 2 else needed
+        digits = rng.integers(0, 10, size=(size, length), dtype=np.uint8)
+        # The first ``complexity`` entries of a random permutation of 0-9
+        targets = np.argsort(rng.random((size, 10)), axis=1)[:, :complexity]
+        target_counts = (digits[:, :, None] == targets[:, None, :]).any(axis=2).sum(axis=1)
+
+        # Ensure the answer is never 10: task 2 needs at least 1 target digit present
+        if task_type == 2:
+            keep = target_counts > 0
+            digits, targets, target_counts = (
+                digits[keep][:needed], targets[keep][:needed], target_counts[keep][:needed]
+            )
+
+        strings = (digits + ord("0")).view(f"S{length}").ravel()
+        for digit_string, target_digits, target_count in zip(
+            strings.tolist(), targets.tolist(), target_counts.tolist()
+        ):
+            batch.append((digit_string.decode(), target_digits, target_count, length - target_count))
+
+    return batch
+
+
+def new_session_seed():
+    return int.from_bytes(os.urandom(8), "big")
+
+
+def compute_answer(digit_string, target_digits, task_type):
+    if task_type == 1:
+        return sum(digit_string.count(str(d)) for d in target_digits)
+    else:
+        total_targets = sum(digit_string.count(str(d)) for d in target_digits)
+        return len(digit_string) - total_targets
+
+
+class SessionEngine:
+    """The experiment's state machine, independent of pygame and the wall clock.
+
+    ``clock`` returns the current time in seconds (default ``time.time``). ``seed``
+    defaults to a fresh random value and is kept in ``self.seed``. Block order, the
+    tutorial and every block's task 1 and task 2 stimuli each draw from their own
+    stream derived from it, so the same seed gives the same block order and the same
+    n-th task 1 and n-th task 2 stimulus in every block, however the participant
+    responds. Each call to ``step(inputs)`` runs one iteration of the original main
+    loop for the current state. Optional callbacks receive the session's side effects:
+
+    - ``on_start()``: the START button was clicked (create the results file)
+    - ``on_trial(row)``: a trial was answered; ``row`` matches the results CSV columns
+    - ``on_finish(summary_data)``: the session ended or the window was closed
+
+    Response timing uses ``clock_ns`` (default ``time.perf_counter_ns``): the frontend
+    reports when a new stimulus first reached the screen with
+    ``mark_stimulus_onset()`` and may pass the time each input arrived to ``step()``.
+
+    If a ``renderer`` is given, ``renderer(engine)`` is called after every step. If a
+    ``stimulus_bank`` (see stimulus_bank.py) is given, stimuli are drawn from it with
+    ``stimulus_sampling`` ("uniform" or "balanced") instead of being generated.
+    """
+
+    def __init__(
+        self,
+        clock=time.time,
+        clock_ns=time.perf_counter_ns,
+        seed=None,
+        conditions=None,
+        on_start=None,
+        on_trial=None,
+        on_finish=None,
+        renderer=None,
+        stimulus_bank=None,
+        stimulus_sampling="uniform",
+    ):
+        self.clock = clock
+        self.clock_ns = clock_ns
+        self.seed = seed if seed is not None else new_session_seed()
+        self.streams = {}  # stream key -> numpy Generator
+        if conditions is None:
+            conditions = make_conditions(self.stream(STREAM_CONDITIONS))
+        self.conditions = conditions
+        self.on_start = on_start
+        self.on_trial = on_trial
+        self.on_finish = on_finish
+        self.renderer = renderer
+        self.stimulus_bank = stimulus_bank
+        self.stimulus_sampling = stimulus_sampling
+
+        self.running = True
+        self.state = STATE_START
+        self.session_started = False
+
+        # SUMMARY TRACKING OF DATA
+        self.summary_data = {}
+        for c in COMPLEXITIES:
+            for t in [1, 2]:
+                self.summary_data[(c, t)] = {
+                    "total": 0,
+                    "correct": 0
+                }
+
+        # TASK VARIABLES
+        self.current_condition_index = 0
+        self.block_index = 0  # block whose stream the running screen draws from
+        self.complexity, self.duration = self.conditions[self.current_condition_index]
+        self.digit_string = ""
+        self.target_digits = []
+        self.answers = (0, 0)  # correct answer for task 1 and task 2
+        self.trial_pools = {}  # (stream key, complexity, task type) -> deque of pre-generated stimuli
+        self.prefetched_trial = None  # first stimulus of the next block, drawn during the break
+        self.task_type = 1  # 1 = count targets, 2 = count non-targets
+        self.user_input = ""
+        self.tasks_completed = 0
+
+        # Response timing (clock_ns values)
+        self.stimulus_onset_ns = None
+        self.last_switch_ns = None
+        self.switch_pending = False  # next answered trial is the first after a switch
+
+        # Keep track of intervals
+        now = self.clock()
+        self.countdown_start_time = None
+        self.break_start_time = None
+        self.condition_start_time = now
+        self.last_switch_time = now
+        self.switch_banner_time = 0
+
+        # Tutorial state
+        self.tutorial_step = 0  # 0=explain task1, 1=practice task1, 2=explain task2, 3=practice task2
+        self.tutorial_input = ""
+        self.tutorial_feedback = ""  # "correct" or "incorrect" or ""
+
+        # step() handler for each state
+        self.handlers = {
+            STATE_START: self._step_start,
+            STATE_COUNTDOWN: self._step_countdown,
+            STATE_RUNNING: self._step_running,
+            STATE_BREAK: self._step_break,
+            STATE_DONE: self._step_done,
+            STATE_TUTORIAL: self._step_tutorial,
+            STATE_TUTORIAL_DONE: self._step_tutorial_done,
+        }
+
+    # -----------------------------
+    # TRIALS
+    # -----------------------------
+    def stream(self, *key):
+        """The NumPy Generator for one purpose of this session, derived from ``seed``."""
+        generator = self.streams.get(key)
+        if generator is None:
+            generator = np.random.default_rng(np.random.SeedSequence(self.seed, spawn_key=key))
+            self.streams[key] = generator
+        return generator
+
+    def stimulus_stream_key(self, block=None):
+        if block is None:
+            if self.state in (STATE_TUTORIAL, STATE_TUTORIAL_DONE):
+                return (STREAM_TUTORIAL,)
+            block = self.block_index
+        return (STREAM_FIRST_BLOCK + block,)
+
+    def prepare_trials(self, complexity, count=TRIAL_BATCH_SIZE, block=None):
+        # Top up both task pools so generate_trial() only pops
+        if self.stimulus_bank is not None:
+            return None
+
+        for task_type in (1, 2):
+            self.trial_pool(complexity, task_type, block, count)
+        return self.trial_pool(complexity, 1, block, 0)
+
+    def trial_pool(self, complexity, task_type, block=None, count=1):
+        key = self.stimulus_stream_key(block)
+        pool = self.trial_pools.setdefault((key, complexity, task_type), deque())
+        if len(pool) < count:
+            pool.extend(generate_trial_batch(
+                self.stream(*key, task_type), complexity, max(count, TRIAL_BATCH_SIZE) - len(pool), task_type
+            ))
+        return pool
+
+    def next_stimulus(self, complexity, task_type, block=None):
+        """Draw one (digit_string, target_digits, task 1 answer, task 2 answer) stimulus."""
+        if self.stimulus_bank is not None:
+            return self.stimulus_bank.sample(
+                self.stream(*self.stimulus_stream_key(block), task_type),
+                complexity,
+                task_type,
+                mode=self.stimulus_sampling,
+            )
+
+        return self.trial_pool(complexity, task_type, block).popleft()
+
+    def generate_trial(self, complexity):
+        self.show_stimulus(self.next_stimulus(complexity, self.task_type))
+
+    def show_stimulus(self, stimulus):
+        digit_string, target_digits, task1_answer, task2_answer = stimulus
+        self.digit_string = digit_string
+        self.target_digits = target_digits
+        self.answers = (task1_answer, task2_answer)
+        self.stimulus_onset_ns = None
+
+    def prefetch_next_block(self, count=PREFETCH_COUNT):
+        """Prepare the upcoming block's stimuli during the countdown or a break.
+
+        Draws the block's first stimulus early (from the block's own stream, so the
+        session is unchanged) and tops up its pools. Returns up to ``count`` upcoming
+        (digit_string, target_digits) pairs, first one exact, so a frontend can render
+        them before the block starts.
+        """
+        if self.state not in (STATE_COUNTDOWN, STATE_BREAK):
+            return []
+
+        block = self.current_condition_index
+        complexity = self.conditions[block][0]
+        if self.prefetched_trial is None:
+            self.prepare_trials(complexity, block=block)
+            self.prefetched_trial = self.next_stimulus(complexity, 1, block=block)
+        upcoming = [self.prefetched_trial[:2]]
+
+        if self.stimulus_bank is None:
+            pool = self.trial_pool(complexity, 1, block, 0)
+            upcoming.extend(stimulus[:2] for stimulus in islice(pool, count - 1))
+            # The switch at the block's first interval shows the first task 2 stimulus
+            upcoming.extend(stimulus[:2] for stimulus in islice(self.trial_pool(complexity, 2, block, 0), 1))
+        return upcoming
+
+    def mark_stimulus_onset(self, timestamp_ns=None):
+        # Called after each flip; only the first flip showing a new stimulus counts
+        if self.stimulus_onset_ns is None:
+            self.stimulus_onset_ns = timestamp_ns if timestamp_ns is not None else self.clock_ns()
+
+    def compute_answer(self):
+        return self.answers[self.task_type - 1]
+
+    def switch_task(self, switch_ns=None):
+        self.task_type = 2 if self.task_type == 1 else 1
+        self.last_switch_ns = switch_ns if switch_ns is not None else self.clock_ns()
+        self.switch_pending = True
+
+    def start_block_timing(self):
+        # A block always starts on task 1; count its first trials from the block start
+        self.last_switch_ns = self.clock_ns()
+        self.switch_pending = False
+
+    def log_trial(self, correct_flag, actual_count, user_answer, response_ns=None):
+        self.tasks_completed += 1
+
+        if response_ns is None:
+            response_ns = self.clock_ns()
+        onset_ns = self.stimulus_onset_ns
+        response_time_ms = (response_ns - onset_ns) / 1e6 if onset_ns is not None else ""
+        if self.last_switch_ns is not None:
+            time_since_switch_ms = (response_ns - self.last_switch_ns) / 1e6
+        else:
+            time_since_switch_ms = ""
+        switch_trial = 1 if self.switch_pending else 0
+        self.switch_pending = False
+
+        # Track summary counts
+        summary = self.summary_data[(self.complexity, self.task_type)]
+        summary["total"] += 1
+        if correct_flag == 1:
+            summary["correct"] += 1
+
+        if self.on_trial is not None:
+            self.on_trial([
+                self.tasks_completed,
+                self.complexity,
+                self.duration,
+                self.task_type,
+                actual_count,
+                user_answer,
+                correct_flag,
+                onset_ns if onset_ns is not None else "",
+                response_ns,
+                response_time_ms,
+                time_since_switch_ms,
+                switch_trial
+            ])
+
+    def finish(self):
+        if self.session_started and self.on_finish is not None:
+            self.on_finish(self.summary_data)
+
+    def switch_banner_visible(self):
+        return self.clock() - self.switch_banner_time < SWITCH_BANNER_DURATION
+
+    def next_deadline(self):
+        """Time of the next clock-driven state change, or None if only input can advance."""
+        if self.state == STATE_COUNTDOWN:
+            return self.countdown_start_time + COUNTDOWN_DURATION
+        if self.state == STATE_RUNNING:
+            return min(
+                self.last_switch_time + self.duration,
+                self.condition_start_time + TOTAL_TRIAL_TIME,
+            )
+        if self.state == STATE_BREAK:
+            return self.break_start_time + BREAK_DURATION
+        return None
+
+    # -----------------------------
+    # MAIN LOOP ITERATION
+    # -----------------------------
+    def step(self, inputs=(), timestamps=None):
+        """Run one loop iteration; ``timestamps`` optionally gives each input's clock_ns arrival time.
+
+        With timestamps, running-screen inputs that arrived before a task switch's
+        deadline are handled before the switch, keys stamped before the current
+        stimulus's onset (``mark_stimulus_onset``) are ignored, and an ENTER is ignored
+        while the current stimulus has not been shown yet.
+        """
+        self.handlers[self.state](self.clock(), inputs, timestamps)
+
+        if self.renderer is not None:
+            self.renderer(self)
+
+    def _quit(self):
+        self.finish()
+        self.running = False
+
+    def _step_start(self, now, inputs, timestamps):
+        for key in inputs:
+            if key == INPUT_QUIT:
+                self._quit()
+
+            elif key == INPUT_START:
+                self.session_started = True
+                if self.on_start is not None:
+                    self.on_start()
+                self.state = STATE_COUNTDOWN
+                self.countdown_start_time = self.clock()
+
+            elif key == INPUT_TUTORIAL:
+                self.tutorial_step = 0
+                self.tutorial_input = ""
+                self.tutorial_feedback = ""
+                self.state = STATE_TUTORIAL
+
+    def _start_block(self):
+        self.complexity, self.duration = self.conditions[self.current_condition_index]
+        self.block_index = self.current_condition_index
+        self.task_type = 1  # always start each block with the count task
+        if self.prefetched_trial is not None:
+            self.show_stimulus(self.prefetched_trial)
+            self.prefetched_trial = None
+        else:
+            self.prepare_trials(self.complexity)
+            self.generate_trial(self.complexity)
+
+        self.condition_start_time = self.clock()
+        self.last_switch_time = self.clock()
+        self.start_block_timing()
+        self.user_input = ""
+
+        self.state = STATE_RUNNING
+
+    def _step_countdown(self, now, inputs, timestamps):
+        if now - self.countdown_start_time >= COUNTDOWN_DURATION:
+            self._start_block()
+
+        for key in inputs:
+            if key == INPUT_QUIT:
+                self._quit()
+
+    def _step_running(self, now, inputs, timestamps):
+        # ----- TASK SWITCH -----
+        if now - self.last_switch_time >= self.duration:
+            # Date the switch at its deadline; inputs that arrived before it still
+            # belong to the stimulus that was on screen
+            late = now - (self.last_switch_time + self.duration)
+            switch_ns = self.clock_ns() - int(late * 1e9)
+            inputs, timestamps = self._handle_running_inputs(inputs, timestamps, switch_ns)
+
+            self.switch_task(switch_ns)
+            self.generate_trial(self.complexity)
+            self.user_input = ""
+            self.last_switch_time = now
+            self.switch_banner_time = now
+
+        # ----- END CONDITION -----
+        if now - self.condition_start_time >= TOTAL_TRIAL_TIME:
+
+            self.current_condition_index += 1
+
+            if self.current_condition_index >= len(self.conditions):
+                self.finish()
+                self.state = STATE_DONE
+            else:
+                self.state = STATE_BREAK
+                self.break_start_time = self.clock()
+
+        # ----- INPUT HANDLING -----
+        self._handle_running_inputs(inputs, timestamps)
+
+    def _handle_running_inputs(self, inputs, timestamps, before_ns=None):
+        """Handle inputs in order, stopping at the first one stamped at or after ``before_ns``.
+
+        Returns the unhandled (inputs, timestamps). With timestamps, keys stamped before
+        the current stimulus's onset are dropped: they cannot answer it. Keys that follow
+        the ENTER or switch that replaced the stimulus, before it is drawn, are kept for
+        it, except an ENTER, which cannot submit an answer to a stimulus not yet shown.
+        """
+        for index, key in enumerate(inputs):
+            stamp = timestamps[index] if timestamps is not None else None
+            if before_ns is not None:
+                if stamp is None or stamp >= before_ns:
+                    return inputs[index:], timestamps[index:] if timestamps is not None else None
+
+            if key == INPUT_QUIT:
+                self._quit()
+
+            elif stamp is not None and self.stimulus_onset_ns is not None and stamp < self.stimulus_onset_ns:
+                continue
+
+            elif key == INPUT_ENTER:
+                unseen = stamp is not None and self.stimulus_onset_ns is None
+                if self.user_input != "" and not unseen:
+                    response_ns = stamp if stamp is not None else self.clock_ns()
+                    correct_answer = self.compute_answer()
+
+                    try:
+                        response = int(self.user_input)
+                    except ValueError:
+                        response = -999
+
+                    correct_flag = 1 if response == correct_answer else 0
+                    self.log_trial(correct_flag, correct_answer, response, response_ns)
+
+                    self.generate_trial(self.complexity)
+                    self.user_input = ""
+
+            elif key == INPUT_BACKSPACE:
+                self.user_input = self.user_input[:-1]
+
+            elif key.isdigit():
+                self.user_input += key
+
+        return [], [] if timestamps is not None else None
+
+    def _step_break(self, now, inputs, timestamps):
+        if now - self.break_start_time >= BREAK_DURATION:
+            self._start_block()
+
+        for key in inputs:
+            if key == INPUT_QUIT:
+                self._quit()
+
+    def _step_done(self, now, inputs, timestamps):
+        for key in inputs:
+            if key == INPUT_QUIT:
+                self._quit()
+
+    def _step_tutorial(self, now, inputs, timestamps):
+        for key in inputs:
+            if key == INPUT_QUIT:
+                self.running = False
+
+            # Explanation steps (0, 2): press SPACE to start practice
+            elif self.tutorial_step in (0, 2):
+                if key == INPUT_SPACE:
+                    self.tutorial_step += 1
+                    self.tutorial_input = ""
+                    self.tutorial_feedback = ""
+                    # Set task_type for practice
+                    self.task_type = 1 if self.tutorial_step == 1 else 2
+                    self.generate_trial(TUTORIAL_COMPLEXITY)
+
+            # Practice steps (1, 3): type answer and submit
+            elif self.tutorial_step in (1, 3):
+
+                if self.tutorial_feedback == "correct":
+                    # SPACE to advance after correct answer
+                    if key == INPUT_SPACE:
+                        self.tutorial_step += 1
+                        self.tutorial_input = ""
+                        self.tutorial_feedback = ""
+                        if self.tutorial_step >= 4:
+                            self.task_type = 1
+                            self.state = STATE_TUTORIAL_DONE
+                else:
+                    if key == INPUT_ENTER:
+                        if self.tutorial_input != "":
+                            correct_answer = self.compute_answer()
+                            try:
+                                response = int(self.tutorial_input)
+                            except ValueError:
+                                response = -999
+
+                            if response == correct_answer:
+                                self.tutorial_feedback = "correct"
+                            else:
+                                self.tutorial_feedback = "incorrect"
+                                self.tutorial_input = ""
+
+                    elif key == INPUT_BACKSPACE:
+                        self.tutorial_input = self.tutorial_input[:-1]
+
+                    elif key.isdigit():
+                        self.tutorial_input += key
+
+    def _step_tutorial_done(self, now, inputs, timestamps):
+        for key in inputs:
+            if key == INPUT_QUIT:
+                self.running = False
+
+            elif key == INPUT_SPACE:
+                self.tutorial_step = 0
+                self.tutorial_input = ""
+                self.tutorial_feedback = ""
+                self.state = STATE_START
+
+
+# -----------------------------
+# HEADLESS SIMULATION
+# -----------------------------
+class SimulatedClock:
+    """A clock that only moves when told to; pass it as SessionEngine(clock=...)."""
+
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    def ns(self):
+        return int(self.now * 1e9)
+
+    def advance_to(self, when):
+        self.now = max(self.now, when)
+
+
+def simulate_session(
+    seed=None,
+    accuracy=0.85,
+    response_time=3.0,
+    on_trial=None,
+    renderer=None,
+    stimulus_bank=None,
+    stimulus_sampling="uniform",
+):
+    """Run one full session on a simulated clock and return the finished engine.
+
+    The simulated participant answers every ``response_time`` seconds on average
+    (exponentially distributed) and is correct with probability ``accuracy``. The clock
+    jumps straight to the next response or state deadline, so a 9-block session takes
+    about 10 ms.
+    """
+    clock = SimulatedClock()
+    engine = SessionEngine(
+        clock=clock,
+        clock_ns=clock.ns,
+        seed=seed,
+        on_trial=on_trial,
+        renderer=renderer,
+        stimulus_bank=stimulus_bank,
+        stimulus_sampling=stimulus_sampling,
+    )
+    rng = random.Random(engine.seed)
+
+    engine.step([INPUT_START])
+    next_response = None
+
+    while engine.state != STATE_DONE:
+        deadline = engine.next_deadline()
+        inputs = []
+
+        if engine.state == STATE_RUNNING:
+            if next_response is None:
+                next_response = clock() + rng.expovariate(1 / response_time)
+
+            if next_response < deadline:
+                clock.advance_to(next_response)
+                answer = engine.compute_answer()
+                if rng.random() >= accuracy:
+                    answer = rng.choice([n for n in range(10) if n != answer])
+                inputs = list(str(answer)) + [INPUT_ENTER]
+                next_response = None
+            else:
+                clock.advance_to(deadline)
+        else:
+            clock.advance_to(deadline)
+
+        engine.step(inputs)
+
+        # No display here: a new stimulus is "shown" as soon as it is generated
+        engine.mark_stimulus_onset()
+
+    return engine
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Run simulated task-switching sessions without a display."
+    )
+    parser.add_argument("--sessions", type=int, default=1000, help="Number of sessions. Default: 1000")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the first session. Default: 0")
+    parser.add_argument("--accuracy", type=float, default=0.85, help="Chance of a correct answer. Default: 0.85")
+    parser.add_argument(
+        "--response-time",
+        type=float,
+        default=3.0,
+        help="Mean seconds per response. Default: 3.0",
+    )
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    trials = 0
+    correct = 0
+    for session in range(args.sessions):
+        engine = simulate_session(args.seed + session, args.accuracy, args.response_time)
+        trials += engine.tasks_completed
+        correct += sum(values["correct"] for values in engine.summary_data.values())
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"{args.sessions} sessions, {trials} trials, "
+        f"accuracy {correct / max(trials, 1):.3f}, {elapsed:.2f} s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import argparse
+import random
+import struct
+import sys
+import time
+from array import array
+from bisect import bisect_right
+from pathlib import Path
+
+from session_engine import COMPLEXITIES
+
+
+MAGIC = b"STIMBANK"
+VERSION = 1
+LENGTH = 10  # digits per stimulus
+HEADER = struct.Struct("<8sHHH")  # magic, version, length, number of complexities
+SECTION = struct.Struct("<HI" + "I" * (LENGTH + 2))  # complexity, count, answer offsets
+
+
+def _chunk_histograms():
+    # Digit histogram of every 5-digit chunk, packed 4 bits per digit. Adding the
+    # entries for both halves gives the histogram of a 10-digit stimulus.
+    table = array("Q", bytes(8 * 100000))
+    for value in range(100000):
+        packed = 0
+        for digit in f"{value:05d}":
+            packed += 1 << (4 * int(digit))
+        table[value] = packed
+    return table
+
+
+class StimulusBank:
+    """Pre-generated (digit string, target set) stimuli indexed by complexity and answer.
+
+    For each complexity the stimuli are stored sorted by target count (the task 1
+    answer; task 2's answer is ``10 - count``), so every (complexity, task type,
+    answer) cell is a contiguous index range and sampling from it is O(1). Digit
+    strings are packed into one ``array('Q')`` entry each and target sets into a
+    10-bit ``array('H')`` mask.
+    """
+
+    def __init__(self, sections=None):
+        # complexity -> (digits array('Q'), masks array('H'), offsets list)
+        self.sections = sections if sections is not None else {}
+
+    @classmethod
+    def build(cls, rng, per_complexity, complexities=COMPLEXITIES):
+        histograms = _chunk_histograms()
+        sections = {}
+
+        for complexity in complexities:
+            by_count = [[] for _ in range(LENGTH + 1)]
+
+            for _ in range(per_complexity):
+                value = rng.randrange(10 ** LENGTH)
+                mask = 0
+                for digit in rng.sample(range(10), complexity):
+                    mask |= 1 << digit
+
+                histogram = histograms[value // 100000] + histograms[value % 100000]
+                count = 0
+                for digit in range(10):
+                    if mask >> digit & 1:
+                        count += histogram >> (4 * digit) & 0xF
+
+                by_count[count].append((value, mask))
+
+            digits = array("Q")
+            masks = array("H")
+            offsets = [0]
+            for stimuli in by_count:
+                for value, mask in stimuli:
+                    digits.append(value)
+                    masks.append(mask)
+                offsets.append(len(digits))
+
+            sections[complexity] = (digits, masks, offsets)
+
+        return cls(sections)
+
+    def save(self, path):
+        with open(path, "wb") as file:
+            file.write(HEADER.pack(MAGIC, VERSION, LENGTH, len(self.sections)))
+
+            for complexity, (digits, masks, offsets) in sorted(self.sections.items()):
+                file.write(SECTION.pack(complexity, len(digits), *offsets))
+
+                # Arrays are stored little-endian
+                if sys.byteorder == "big":
+                    digits, masks = array("Q", digits), array("H", masks)
+                    digits.byteswap()
+                    masks.byteswap()
+                digits.tofile(file)
+                masks.tofile(file)
+
+    @classmethod
+    def load(cls, path):
+        sections = {}
+
+        with open(path, "rb") as file:
+            magic, version, length, section_count = HEADER.unpack(file.read(HEADER.size))
+            if magic != MAGIC or version != VERSION or length != LENGTH:
+                raise ValueError(f"{path} is not a version {VERSION} stimulus bank")
+
+            for _ in range(section_count):
+                complexity, count, *offsets = SECTION.unpack(file.read(SECTION.size))
+                digits = array("Q")
+                masks = array("H")
+                digits.fromfile(file, count)
+                masks.fromfile(file, count)
+                if sys.byteorder == "big":
+                    digits.byteswap()
+                    masks.byteswap()
+                sections[complexity] = (digits, masks, offsets)
+
+        return cls(sections)
+
+    def answer_range(self, complexity, task_type, answer):
+        """Index range of stimuli whose correct answer for task_type is answer."""
+        offsets = self.sections[complexity][2]
+        count = answer if task_type == 1 else LENGTH - answer
+        if not 0 <= count <= LENGTH:
+            return 0, 0
+        return offsets[count], offsets[count + 1]
+
+    def answers(self, complexity, task_type):
+        """Answers with at least one stimulus for this complexity and task type."""
+        # Task 2 never uses stimuli without a target digit, so its answer is never 10
+        answers = []
+        for answer in range(LENGTH + 1):
+            if task_type == 2 and answer == LENGTH:
+                continue
+            start, end = self.answer_range(complexity, task_type, answer)
+            if start < end:
+                answers.append(answer)
+        return answers
+
+    def stimulus(self, complexity, index):
+        """Return (digit_string, target_digits, task 1 answer, task 2 answer)."""
+        digits, masks, offsets = self.sections[complexity]
+        digit_string = f"{digits[index]:0{LENGTH}d}"
+        mask = masks[index]
+        target_digits = [digit for digit in range(10) if mask >> digit & 1]
+
+        count = bisect_right(offsets, index) - 1
+        return digit_string, target_digits, count, LENGTH - count
+
+    def sample(self, rng, complexity, task_type, answer=None, mode="uniform"):
+        """Draw one stimulus without rejection.
+
+        With ``answer`` given, the stimulus has that correct answer (stratified
+        sampling). Otherwise ``mode="uniform"`` draws from the natural answer
+        distribution and ``mode="balanced"`` first picks an answer uniformly.
+        """
+        if answer is None and mode == "balanced":
+            answer = rng.choice(self.answers(complexity, task_type))
+
+        if answer is not None:
+            start, end = self.answer_range(complexity, task_type, answer)
+            if start == end:
+                raise ValueError(
+                    f"no stimuli with answer {answer} for complexity {complexity}, task {task_type}"
+                )
+        else:
+            offsets = self.sections[complexity][2]
+            # Task 2 skips stimuli without a target digit, which sort first
+            start = offsets[1] if task_type == 2 else 0
+            end = offsets[-1]
+
+        return self.stimulus(complexity, start + int(rng.random() * (end - start)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Build the on-disk stimulus bank used by the experiment."
+    )
+    parser.add_argument(
+        "output_file",
+        nargs="?",
+        default="stimulus_bank.bin",
+        help="Output file path. Default: stimulus_bank.bin",
+    )
+    parser.add_argument(
+        "--per-complexity",
+        type=int,
+        default=100000,
+        help="Stimuli generated for each complexity level. Default: 100000",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Random seed. Default: 0")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    bank = StimulusBank.build(random.Random(args.seed), args.per_complexity)
+    bank.save(Path(args.output_file))
+    elapsed = time.perf_counter() - start
+
+    print(f"Wrote {args.output_file} ({args.per_complexity} stimuli per complexity, {elapsed:.2f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import argparse
+import csv
+import time
+from pathlib import Path
+
+from aggregate_accuracy import COMPLEXITY_LABELS, REQUIRED_COLUMNS
+from session_engine import TRIAL_COLUMNS
+
+
+FEATURE_COLUMNS = [
+    "complexity_label",
+    "block_index",
+    "position_in_block",
+    "trial_type",
+    "task_switch",
+    "run_position",
+]
+
+OUTPUT_COLUMNS = ["participant", "source_file"] + TRIAL_COLUMNS + FEATURE_COLUMNS
+
+TRIAL_TYPE_START = "start"    # first trial of a block
+TRIAL_TYPE_SWITCH = "switch"  # first trial answered after a task switch
+TRIAL_TYPE_REPEAT = "repeat"  # any other trial
+
+
+# -----------------------------
+# PIPELINE STAGES
+# -----------------------------
+# Each stage is a generator over row dicts, so a whole folder streams through
+# in constant memory: only the current row and the previous one are held.
+def iter_session_rows(csv_path: Path, participant: int):
+    """Yield the trial rows aggregate_accuracy.py counts, tagged with participant and source_file."""
+    with csv_path.open("r", newline="") as file:
+        reader = csv.DictReader(file)
+
+        if reader.fieldnames is None:
+            return
+
+        missing_columns = REQUIRED_COLUMNS - set(reader.fieldnames)
+        if missing_columns:
+            raise ValueError(
+                f"{csv_path.name} is missing required columns: "
+                f"{', '.join(sorted(missing_columns))}"
+            )
+
+        for row in reader:
+            complexity = (row.get("complexity") or "").strip()
+            interval_length = (row.get("interval_length") or "").strip()
+            correct = (row.get("correct") or "").strip()
+
+            # Ignore blank rows or summary rows appended beside the trial data.
+            if not complexity or not interval_length or correct not in {"0", "1"}:
+                continue
+
+            row["complexity"] = complexity
+            row["interval_length"] = interval_length
+            row["correct"] = correct
+            row["participant"] = participant
+            row["source_file"] = csv_path.name
+            yield row
+
+
+def add_trial_features(rows):
+    """Add block, position and switch/repeat fields to one session's rows.
+
+    A new block starts whenever complexity or interval_length changes. A trial is a
+    switch when its recorded switch_trial is 1. Legacy seven-column files have no
+    switch_trial; there a trial is a switch when its task_type differs from the
+    previous trial's in the block. run_position counts trials since the block start
+    or the last switch (1-based).
+    """
+    block = None
+    block_index = 0
+    position = 0
+    previous_task_type = None
+    run_position = 0
+
+    for row in rows:
+        task_type = (row.get("task_type") or "").strip()
+        recorded_switch = (row.get("switch_trial") or "").strip()
+
+        if recorded_switch in {"0", "1"}:
+            switch = recorded_switch == "1"
+        else:
+            switch = task_type != previous_task_type
+
+        if (row["complexity"], row["interval_length"]) != block:
+            block = (row["complexity"], row["interval_length"])
+            block_index += 1
+            position = 0
+            # A switch before the block's first answer still makes it a switch trial
+            trial_type = TRIAL_TYPE_SWITCH if recorded_switch == "1" else TRIAL_TYPE_START
+        elif switch:
+            trial_type = TRIAL_TYPE_SWITCH
+        else:
+            trial_type = TRIAL_TYPE_REPEAT
+
+        position += 1
+        run_position = run_position + 1 if trial_type == TRIAL_TYPE_REPEAT else 1
+        previous_task_type = task_type
+
+        row["complexity_label"] = COMPLEXITY_LABELS.get(row["complexity"], row["complexity"])
+        row["block_index"] = block_index
+        row["position_in_block"] = position
+        row["trial_type"] = trial_type
+        row["task_switch"] = 1 if trial_type == TRIAL_TYPE_SWITCH else 0
+        row["run_position"] = run_position
+        yield row
+
+
+def iter_trials(input_folder: Path):
+    """Yield every trial of the folder with its derived fields.
+
+    Files are read in sorted order and participant n is the n-th file, as in
+    aggregate_accuracy.py.
+    """
+    for participant, csv_path in enumerate(sorted(input_folder.glob("*.csv")), start=1):
+        yield from add_trial_features(iter_session_rows(csv_path, participant))
+
+
+def write_trials(rows, output_file: Path) -> int:
+    """Write rows as a long-format CSV with OUTPUT_COLUMNS; returns the row count."""
+    count = 0
+    with output_file.open("w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(OUTPUT_COLUMNS)
+        for row in rows:
+            # Older session files lack the timing columns; those cells stay blank
+            writer.writerow([row.get(column, "") for column in OUTPUT_COLUMNS])
+            count += 1
+    return count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Write one long-format trial table with block and switch/repeat fields."
+    )
+    parser.add_argument(
+        "input_folder",
+        nargs="?",
+        default="session_data",
+        help="Folder containing participant CSV files. Default: session_data",
+    )
+    parser.add_argument(
+        "output_file",
+        nargs="?",
+        default="trial_features.csv",
+        help="Output CSV file. Default: trial_features.csv",
+    )
+    args = parser.parse_args()
+
+    input_folder = Path(args.input_folder)
+    output_file = Path(args.output_file)
+
+    if not input_folder.exists() or not input_folder.is_dir():
+        raise FileNotFoundError(f"Input folder not found: {input_folder}")
+
+    start = time.perf_counter()
+    count = write_trials(iter_trials(input_folder), output_file)
+    elapsed = time.perf_counter() - start
+
+    print(f"Wrote {count} trials to {output_file} ({elapsed:.2f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import csv
+import os
+import queue
+import threading
+import time
+
+
+_FLUSH = object()
+_CLOSE = object()
+
+FLUSH_POLL_INTERVAL = 0.1  # seconds between checks that the writer thread is still running
+
+
+class TrialLogger:
+    """Append trial rows to a CSV file from a background thread.
+
+    The file handle stays open for the whole session. ``log()`` only puts the row on a
+    queue, so the pygame loop never waits on the disk; the writer thread does the
+    actual write and flushes according to the configured policy:
+
+    - ``flush_every``: flush after this many rows (``0`` disables row-based flushing)
+    - ``flush_interval``: flush when this many seconds have passed since the last flush
+    - ``fsync``: also ``os.fsync`` the file on every flush, not just on close
+
+    ``blocked_time`` is the total time (seconds) the calling thread spent inside
+    ``log()``, ``flush()`` and ``close()``.
+
+    If the writer thread fails, the error is raised by the next ``log()``, ``flush()``
+    or ``close()`` call, so rows are never silently dropped.
+    """
+
+    def __init__(self, path, flush_every=1, flush_interval=None, fsync=False):
+        self.path = path
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+
+        self.rows_logged = 0
+        self.blocked_time = 0.0
+
+        self._queue = queue.Queue()
+        self._error = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="TrialLogger", daemon=True)
+        self._thread.start()
+
+    def log(self, row):
+        start = time.perf_counter()
+        if self._closed:
+            raise ValueError("TrialLogger is closed")
+        if self._error is not None:
+            # The writer thread has stopped; nothing queued from now on would be written
+            raise self._error
+        self._queue.put(row)
+        self.rows_logged += 1
+        self.blocked_time += time.perf_counter() - start
+
+    def flush(self):
+        """Block until every row logged so far is written and flushed."""
+        start = time.perf_counter()
+        if not self._closed and self._thread.is_alive():
+            done = threading.Event()
+            self._queue.put((_FLUSH, done))
+            # The writer can stop (error or a concurrent close()) before it reaches the
+            # request, and then nobody sets done; stop waiting once it has exited
+            while not done.wait(FLUSH_POLL_INTERVAL):
+                if not self._thread.is_alive():
+                    break
+        self.blocked_time += time.perf_counter() - start
+        self._raise_error()
+
+    def close(self):
+        """Write any queued rows, flush, fsync and close the file. Safe to call twice."""
+        start = time.perf_counter()
+        if not self._closed:
+            self._closed = True
+            self._queue.put(_CLOSE)
+            self._thread.join()
+        self.blocked_time += time.perf_counter() - start
+        self._raise_error()
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _flush_file(self, file, fsync):
+        file.flush()
+        if fsync:
+            os.fsync(file.fileno())
+
+    def _run(self):
+        try:
+            with open(self.path, "a", newline="") as file:
+                writer = csv.writer(file)
+                pending = 0
+                last_flush = time.monotonic()
+
+                while True:
+                    timeout = None
+                    if pending and self.flush_interval is not None:
+                        timeout = max(0.0, last_flush + self.flush_interval - time.monotonic())
+
+                    try:
+                        item = self._queue.get(timeout=timeout)
+                    except queue.Empty:
+                        item = None
+
+                    if item is _CLOSE:
+                        self._flush_file(file, True)
+                        return
+
+                    if isinstance(item, tuple) and item and item[0] is _FLUSH:
+                        self._flush_file(file, self.fsync)
+                        pending = 0
+                        last_flush = time.monotonic()
+                        item[1].set()
+                        continue
+
+                    if item is not None:
+                        writer.writerow(item)
+                        pending += 1
+
+                    due_by_rows = self.flush_every and pending >= self.flush_every
+                    due_by_time = (
+                        pending
+                        and self.flush_interval is not None
+                        and time.monotonic() - last_flush >= self.flush_interval
+                    )
+                    if due_by_rows or due_by_time:
+                        self._flush_file(file, self.fsync)
+                        pending = 0
+                        last_flush = time.monotonic()
+        except Exception as error:
+            # Any failure (disk, unwritable row, ...) ends the thread; report it to the caller
+            self._error = error
+            # Unblock anyone waiting on a flush that will never happen.
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if isinstance(item, tuple) and item and item[0] is _FLUSH:
+                    item[1].set()
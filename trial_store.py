@@ -0,0 +1,321 @@
+import argparse
+import csv
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+from aggregate_accuracy import (
+    COMPLEXITY_LABELS,
+    COMPLEXITY_ORDER,
+    REQUIRED_COLUMNS,
+    file_fingerprint,
+)
+
+
+SCHEMA_VERSION = 1
+COMMIT_EVERY = 500  # session files per transaction
+
+# complexity and interval_length stay TEXT, exactly as written in the session file,
+# so queries group and sort them the way aggregate_accuracy.py does.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    folder TEXT NOT NULL,
+    file_name TEXT NOT NULL,
+    participant INTEGER,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    trials INTEGER NOT NULL,
+    ingested_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS trials (
+    session_id INTEGER NOT NULL REFERENCES sessions(session_id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    trial INTEGER,
+    complexity TEXT NOT NULL,
+    interval_length TEXT NOT NULL,
+    task_type INTEGER,
+    actual_count INTEGER,
+    user_answer INTEGER,
+    correct INTEGER NOT NULL,
+    stimulus_onset_ns INTEGER,
+    response_ns INTEGER,
+    response_time_ms REAL,
+    time_since_switch_ms REAL,
+    switch_trial INTEGER,
+    PRIMARY KEY (session_id, position)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS sessions_folder_participant ON sessions (folder, participant);
+CREATE INDEX IF NOT EXISTS trials_cell ON trials (session_id, complexity, interval_length, correct);
+CREATE INDEX IF NOT EXISTS trials_condition ON trials (complexity, interval_length, task_type);
+CREATE INDEX IF NOT EXISTS trials_task_type ON trials (task_type, correct);
+"""
+
+TRIAL_FIELDS = [
+    ("trial", int),
+    ("task_type", int),
+    ("actual_count", int),
+    ("user_answer", int),
+    ("stimulus_onset_ns", int),
+    ("response_ns", int),
+    ("response_time_ms", float),
+    ("time_since_switch_ms", float),
+    ("switch_trial", int),
+]
+
+
+def connect(db_file: Path) -> sqlite3.Connection:
+    connection = sqlite3.connect(db_file)
+    connection.execute("PRAGMA foreign_keys = ON")
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.execute("PRAGMA synchronous = NORMAL")
+
+    version = connection.execute("PRAGMA user_version").fetchone()[0]
+    if version not in (0, SCHEMA_VERSION):
+        raise ValueError(f"{db_file} has schema version {version}, expected {SCHEMA_VERSION}")
+
+    connection.executescript(SCHEMA)
+    connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return connection
+
+
+def parse_number(text, convert):
+    if not text:
+        return None
+    try:
+        return convert(text)
+    except ValueError:
+        return None
+
+
+def read_trial_rows(csv_path: Path) -> list:
+    """Return the trial rows aggregate_accuracy.py would count, ready for insertion."""
+    rows = []
+
+    with csv_path.open("r", newline="") as file:
+        reader = csv.reader(file)
+        header = next(reader, None)
+
+        if header is None:
+            return rows
+
+        missing_columns = REQUIRED_COLUMNS - set(header)
+        if missing_columns:
+            raise ValueError(
+                f"{csv_path.name} is missing required columns: "
+                f"{', '.join(sorted(missing_columns))}"
+            )
+
+        # A duplicated column name resolves to its last occurrence, as in csv.DictReader;
+        # absent optional columns read as ""
+        columns = {name: index for index, name in enumerate(header)}
+        complexity_index = columns["complexity"]
+        interval_index = columns["interval_length"]
+        correct_index = columns["correct"]
+        fields = [(columns.get(name), convert) for name, convert in TRIAL_FIELDS]
+
+        for position, row in enumerate(reader):
+            width = len(row)
+            complexity = row[complexity_index].strip() if complexity_index < width else ""
+            interval_length = row[interval_index].strip() if interval_index < width else ""
+            correct = row[correct_index].strip() if correct_index < width else ""
+
+            # Same filter as read_session_counts(): blank and summary-only rows are skipped
+            if not complexity or not interval_length or correct not in {"0", "1"}:
+                continue
+
+            trial, task_type, actual_count, user_answer, *timing = [
+                parse_number(row[index].strip(), convert)
+                if index is not None and index < width else None
+                for index, convert in fields
+            ]
+            rows.append((
+                position,
+                trial,
+                complexity,
+                interval_length,
+                task_type,
+                actual_count,
+                user_answer,
+                int(correct),
+                *timing,
+            ))
+
+    return rows
+
+
+def ingest_file(connection: sqlite3.Connection, csv_path: Path) -> bool:
+    """Load one session file, replacing an older copy. Returns False if it was unchanged."""
+    path = str(csv_path.resolve())
+    stat = csv_path.stat()
+
+    existing = connection.execute(
+        "SELECT session_id, size, mtime_ns, sha256 FROM sessions WHERE path = ?", (path,)
+    ).fetchone()
+    if existing is not None and existing[1:3] == (stat.st_size, stat.st_mtime_ns):
+        return False
+
+    fingerprint = file_fingerprint(csv_path)
+    if existing is not None and existing[3] == fingerprint["sha256"]:
+        # Touched but unchanged: only refresh the stored mtime
+        connection.execute(
+            "UPDATE sessions SET mtime_ns = ? WHERE session_id = ?",
+            (fingerprint["mtime_ns"], existing[0]),
+        )
+        return False
+
+    rows = read_trial_rows(csv_path)
+
+    if existing is not None:
+        connection.execute("DELETE FROM sessions WHERE session_id = ?", (existing[0],))
+
+    session_id = connection.execute(
+        "INSERT INTO sessions (path, folder, file_name, size, mtime_ns, sha256, trials, ingested_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            path,
+            str(Path(path).parent),
+            csv_path.name,
+            fingerprint["size"],
+            fingerprint["mtime_ns"],
+            fingerprint["sha256"],
+            len(rows),
+            time.time(),
+        ),
+    ).lastrowid
+
+    connection.executemany(
+        "INSERT INTO trials VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        ((session_id, *row) for row in rows),
+    )
+    return True
+
+
+def number_participants(connection: sqlite3.Connection, folder: str) -> None:
+    # Participant n is the n-th file of its folder in sorted order, as in aggregate_accuracy.py
+    session_ids = connection.execute(
+        "SELECT session_id FROM sessions WHERE folder = ? ORDER BY path", (folder,)
+    ).fetchall()
+    connection.executemany(
+        "UPDATE sessions SET participant = ? WHERE session_id = ?",
+        ((participant, session_id) for participant, (session_id,) in enumerate(session_ids, start=1)),
+    )
+
+
+def ingest_folder(connection: sqlite3.Connection, input_folder: Path, prune: bool = False) -> dict:
+    """Ingest every *.csv in input_folder. Re-running it only reloads changed files."""
+    csv_files = sorted(input_folder.glob("*.csv"))
+    folder = str(input_folder.resolve())
+    stats = {"files": len(csv_files), "loaded": 0, "unchanged": 0, "removed": 0}
+
+    # Each file's delete and insert share a transaction, so an interrupted ingest
+    # never leaves a half-loaded session behind
+    for start in range(0, len(csv_files), COMMIT_EVERY):
+        with connection:
+            for csv_path in csv_files[start:start + COMMIT_EVERY]:
+                if ingest_file(connection, csv_path):
+                    stats["loaded"] += 1
+                else:
+                    stats["unchanged"] += 1
+
+    with connection:
+        if prune:
+            present = {str(csv_path.resolve()) for csv_path in csv_files}
+            stored = connection.execute(
+                "SELECT session_id, path FROM sessions WHERE folder = ?", (folder,)
+            ).fetchall()
+            removed = [(session_id,) for session_id, path in stored if path not in present]
+            connection.executemany("DELETE FROM sessions WHERE session_id = ?", removed)
+            stats["removed"] = len(removed)
+
+        number_participants(connection, folder)
+
+    return stats
+
+
+def complexity_label_sql(column: str) -> str:
+    cases = " ".join(f"WHEN '{value}' THEN '{label}'" for value, label in COMPLEXITY_LABELS.items())
+    return f"CASE {column} {cases} ELSE {column} END"
+
+
+def complexity_order_sql(column: str) -> str:
+    cases = " ".join(f"WHEN '{label}' THEN {order}" for label, order in COMPLEXITY_ORDER.items())
+    return f"CASE {column} {cases} ELSE 999 END"
+
+
+ACCURACY_QUERY = f"""
+SELECT
+    s.participant,
+    {complexity_label_sql("t.complexity")} AS complexity_label,
+    t.interval_length,
+    COUNT(*) AS tasks_completed,
+    CAST(SUM(t.correct) AS REAL) / COUNT(*) AS accuracy
+FROM sessions AS s
+JOIN trials AS t ON t.session_id = s.session_id
+WHERE s.folder = ?
+GROUP BY s.participant, complexity_label, t.interval_length
+ORDER BY s.participant, {complexity_order_sql("complexity_label")}, t.interval_length, complexity_label
+"""
+
+
+def accuracy_rows(connection: sqlite3.Connection, input_folder: Path):
+    """Yield participant_accuracy.csv rows for one ingested folder."""
+    return connection.execute(ACCURACY_QUERY, (str(input_folder.resolve()),))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Load session files into a SQLite trial store and query it."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest = subparsers.add_parser("ingest", help="Load (or reload changed) session files.")
+    ingest.add_argument(
+        "input_folder",
+        nargs="?",
+        default="session_data",
+        help="Folder containing participant CSV files. Default: session_data",
+    )
+    ingest.add_argument("--db", default="trials.db", help="SQLite database file. Default: trials.db")
+    ingest.add_argument(
+        "--prune",
+        action="store_true",
+        help="Also drop stored sessions whose files are no longer in the folder.",
+    )
+
+    query = subparsers.add_parser("query", help="Run a SQL query and print the result as CSV.")
+    query.add_argument("sql", help='e.g. "SELECT task_type, AVG(correct) FROM trials GROUP BY task_type"')
+    query.add_argument("--db", default="trials.db", help="SQLite database file. Default: trials.db")
+
+    args = parser.parse_args()
+    connection = connect(Path(args.db))
+
+    try:
+        if args.command == "ingest":
+            input_folder = Path(args.input_folder)
+            if not input_folder.exists() or not input_folder.is_dir():
+                raise FileNotFoundError(f"Input folder not found: {input_folder}")
+
+            start = time.perf_counter()
+            stats = ingest_folder(connection, input_folder, prune=args.prune)
+            elapsed = time.perf_counter() - start
+            print(
+                f"{stats['files']} files: {stats['loaded']} loaded, {stats['unchanged']} unchanged, "
+                f"{stats['removed']} removed ({elapsed:.2f} s)"
+            )
+        else:
+            cursor = connection.execute(args.sql)
+            writer = csv.writer(sys.stdout)
+            writer.writerow([column[0] for column in cursor.description or []])
+            writer.writerows(cursor)
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()